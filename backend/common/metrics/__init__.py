@@ -0,0 +1 @@
+from .metrics import Counter, Gauge, Histogram, CallbackMetric, Registry, DEFAULT_BUCKETS
@@ -0,0 +1,208 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds), from fast cached reads up to the request deadline
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    '''
+    Monotonic counter
+
+    Attributes
+    ----------
+    value : float
+        current value
+    '''
+    type = 'counter'
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> Iterator[Sample]:
+        yield self.name + '_total', (), self.value
+
+
+class Gauge(Counter):
+    '''
+    Value that can go up and down
+    '''
+    type = 'gauge'
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self) -> Iterator[Sample]:
+        yield self.name, (), self.value
+
+
+class CallbackMetric:
+    '''
+    Counter or gauge read from a callback at scrape time
+
+    Exposes counters the app already keeps (executor, cache, sweeper
+    stats) without touching their hot paths. The callback returns a
+    number, a {label value: number} dict (with `label`) or None to skip.
+    '''
+
+    def __init__(
+        self, name: str, description: str, callback: Callable[[], object],
+        type: str = 'gauge', label: Optional[str] = None  # pylint: disable=W0622
+    ):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.type = type
+        self.label = label
+
+    def samples(self) -> Iterator[Sample]:
+        name = self.name + '_total' if self.type == 'counter' else self.name
+        value = self.callback()
+        if value is None:
+            return
+        if isinstance(value, dict):
+            for label_value, item in value.items():
+                yield name, ((self.label, label_value),), item
+            return
+        yield name, (), value
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Per-bucket (non cumulative) counts, accumulated at scrape time
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    '''
+    Fixed-bucket histogram, optionally split by labels
+
+    Observations only bump preallocated counters: no locks (all updates
+    happen on the event loop thread) and no allocation once a label set
+    has been seen. Label children are created on first use, so label
+    values must come from a bounded set (route templates, not raw paths).
+
+    Parameters
+    ----------
+    name: str
+        metric name.
+    description: str
+        help text.
+    labelnames: Sequence[str]
+        label names, values are passed positionally to `labels`.
+    buckets: Sequence[float]
+        upper bounds of the buckets (sorted).
+    '''
+    type = 'histogram'
+
+    def __init__(
+        self, name: str, description: str, labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[tuple, _HistogramChild] = {}
+        self._default = None if self.labelnames else _HistogramChild(self.buckets)
+
+    def labels(self, *values) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _series(self) -> Iterator[Tuple[tuple, _HistogramChild]]:
+        if self._default is not None:
+            yield (), self._default
+        for values, child in list(self._children.items()):
+            yield tuple(zip(self.labelnames, map(str, values))), child
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, child in self._series():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                yield self.name + '_bucket', labels + (('le', _format_value(bound)),), cumulative
+            yield self.name + '_sum', labels, child.sum
+            yield self.name + '_count', labels, child.count
+
+
+class Registry:
+    '''
+    Set of metrics rendered in the Prometheus text format
+    '''
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self.register(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self.register(Gauge(name, description))
+
+    def histogram(self, name: str, description: str, **kwargs) -> Histogram:
+        return self.register(Histogram(name, description, **kwargs))
+
+    def callback(self, name: str, description: str, callback: Callable, **kwargs) -> CallbackMetric:
+        return self.register(CallbackMetric(name, description, callback, **kwargs))
+
+    def render(self) -> bytes:
+        '''
+        Prometheus text exposition (version 0.0.4) of all metrics
+        '''
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
@@ -0,0 +1,4 @@
+from .deadline_middleware import DeadlineMiddleware, request_deadline, remaining_budget
+from .metrics_middleware import MetricsMiddleware
+from .query_middleware import QueryStatsMiddleware, QueryStats, QueryBudgetExceeded, \
+    request_query_stats, instrument_engine, query_budget, UNCOUNTED
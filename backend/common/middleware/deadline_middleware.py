@@ -0,0 +1,85 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Monotonic deadline of the current request (None - no deadline)
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    '''
+    Seconds left until the current request's deadline (None if unlimited)
+    '''
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    '''
+    Pure ASGI request deadline middleware
+
+    Cancels the request once its budget is spent and answers 504 (if the
+    response hasn't started yet). The deadline is published through the
+    `request_deadline` context variable, so lower layers (db sessions) can
+    bound their own work by the remaining budget.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        wrapped application.
+    timeout: float
+        default budget per request (seconds).
+    route_timeouts: dict
+        budget overrides by path, None - no deadline.
+    '''
+
+    def __init__(
+        self, app: ASGIApp, timeout: float,
+        route_timeouts: Optional[Dict[str, Optional[float]]] = None
+    ):
+        self.app = app
+        self.timeout = timeout
+        self.route_timeouts = route_timeouts or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        timeout = self.route_timeouts.get(scope['path'], self.timeout)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.monotonic()
+        token = request_deadline.set(start_time + timeout)
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        deadline = asyncio.timeout(timeout)
+        try:
+            async with deadline:
+                await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            # Timeouts raised by the app itself (driver, socket) aren't overruns,
+            # after the response started it's too late for an error response
+            if response_started or not deadline.expired():
+                raise
+            response = JSONResponse(
+                {
+                    'detail': 'Request processing time excedeed limit',
+                    'processing_time': time.monotonic() - start_time
+                },
+                status_code=504
+            )
+            await response(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
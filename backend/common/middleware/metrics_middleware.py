@@ -0,0 +1,58 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.common.metrics import Gauge, Histogram
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class MetricsMiddleware:
+    '''
+    Pure ASGI request metrics middleware
+
+    Records request latency by route template, method and status code,
+    plus the number of requests in flight. The route comes from
+    `scope['route']` (set by the router once matched), so label values stay
+    bounded no matter what paths clients send.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        wrapped application.
+    latency: Histogram
+        histogram labeled by (route, method, status).
+    in_flight: Gauge
+        gauge of requests being processed.
+    '''
+
+    def __init__(self, app: ASGIApp, latency: Histogram, in_flight: Gauge):
+        self.app = app
+        self.latency = latency
+        self.in_flight = in_flight
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        self.in_flight.value += 1
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.in_flight.value -= 1
+            route = scope.get('route')
+            self.latency.labels(
+                route.path if route is not None else UNMATCHED_ROUTE,
+                scope['method'], status_code
+            ).observe(elapsed)
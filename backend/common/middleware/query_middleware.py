@@ -0,0 +1,166 @@
+import time
+import logging
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    '''
+    SQL statements issued while serving one request
+
+    Attributes
+    ----------
+    count : int
+        number of executed statements
+    duration : float
+        time spent in the database driver (seconds)
+    budget : Optional[int]
+        max number of statements declared by the endpoint (`query_budget`)
+    statements : dict
+        executions per statement text (N+1 detection)
+    '''
+    __slots__ = ('count', 'duration', 'budget', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.budget: Optional[int] = None
+        self.statements: Dict[str, int] = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    '''
+    Raised in test mode when an endpoint issues more queries than declared
+    '''
+
+
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    'request_query_stats', default=None
+)
+
+# Execution options of bookkeeping statements (session setup) left out of the stats
+UNCOUNTED = {'query_stats': False}
+
+
+def _counted(context) -> bool:
+    return context is None or context.execution_options.get('query_stats', True)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_query_stats.get() is not None and _counted(context):
+        conn.info['query_start_time'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_query_stats.get()
+    if stats is None or not _counted(context):
+        return
+    stats.count += 1
+    stats.duration += time.perf_counter() - conn.info.pop('query_start_time', time.perf_counter())
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Count statements & driver time of `engine` into the current request stats,
+    statements executed with the `UNCOUNTED` options are skipped
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def query_budget(max_queries: int) -> Callable[[], None]:
+    """
+    Endpoint dependency declaring the max number of SQL statements it may issue
+    """
+    def declare_budget() -> None:
+        stats = request_query_stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+    return declare_budget
+
+
+class QueryStatsMiddleware:
+    '''
+    Pure ASGI per-request SQL statistics middleware
+
+    Collects the statements of the request (see `instrument_engine`) and
+    reports them in a `Server-Timing` header (`db` - driver time & query
+    count, `app` - time until the response started) and in the log. The
+    same statement repeated `repeat_threshold` times is logged as a likely
+    N+1 pattern, going over the endpoint's `query_budget` is logged too or
+    raises `QueryBudgetExceeded` with `enforce_budget` (test mode).
+
+    Parameters
+    ----------
+    app: ASGIApp
+        wrapped application.
+    enforce_budget: bool
+        fail requests over their query budget.
+    repeat_threshold: int
+        executions of one statement reported as N+1 (0 disables).
+    '''
+
+    def __init__(
+        self, app: ASGIApp, enforce_budget: bool = False, repeat_threshold: int = 10
+    ):
+        self.app = app
+        self.enforce_budget = enforce_budget
+        self.repeat_threshold = repeat_threshold
+
+    def _report(self, scope: Scope, stats: QueryStats) -> None:
+        route = scope.get('route')
+        path = route.path if route is not None else scope['path']
+        logger.info(
+            "%s %s: %d queries, %.2f ms db", scope['method'], path,
+            stats.count, stats.duration * 1000
+        )
+        if self.repeat_threshold > 0:
+            for statement, executions in stats.statements.items():
+                if executions >= self.repeat_threshold:
+                    logger.warning(
+                        "%s %s: possible N+1, statement executed %d times: %s",
+                        scope['method'], path, executions, statement
+                    )
+        if stats.budget is not None and stats.count > stats.budget:
+            message = (
+                f"{scope['method']} {path} issued {stats.count} queries, "
+                f"budget is {stats.budget}"
+            )
+            if self.enforce_budget:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = request_query_stats.set(stats)
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                # Database work of regular responses is done by now
+                elapsed = time.perf_counter() - start_time
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", '
+                    f'app;dur={elapsed * 1000:.2f}'
+                )
+                self._report(scope, stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_query_stats.reset(token)
@@ -1,9 +1,19 @@
-from typing import AsyncIterator
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+from sqlalchemy import bindparam, insert, update, delete, inspect
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload, Load
+from sqlalchemy.orm import selectinload, Load, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.common.util.flight_util import SingleFlight
+
+# Max number of cached statement templates (shared by all models)
+STATEMENT_CACHE_SIZE = 512
+# Max wait (seconds) of a read coalesced into another session's in-flight query
+READ_FLIGHT_TIMEOUT = 1.0
+
 
 class CRUDMixin:
     '''
@@ -13,15 +23,31 @@ class CRUDMixin:
     ----------
     create(session: AsyncSession, **kwargs):
         Creates and returns a new object in the table.
+    create_many(session: AsyncSession, rows: List[dict]):
+        Creates and returns several objects in one statement.
     read_all(session: AsyncSession, **kwargs):
-        Returns all objects in the table.
+        Returns all objects in the table (offset or keyset paginated).
     read_by_id(session: AsyncSession, item_id: int, **kwargs):
         Returns an object by its ID.
+    stream(session: AsyncSession, batch_size: int, **kwargs):
+        Yields all matching objects in batches from a server-side cursor.
     update(session: AsyncSession, item: T, **kwargs):
         Updates an object.
+    update_by_id(session: AsyncSession, item_id: int, **kwargs):
+        Updates an object by its ID and returns it.
+    update_many(session: AsyncSession, rows: List[dict]):
+        Updates several objects by their IDs.
     delete(session: AsyncSession, item: T):
         Deletes an object.
+    delete_by_id(session: AsyncSession, item_id: int):
+        Deletes an object by its ID.
+
+    Write methods issue a single statement (INSERT/UPDATE/DELETE ...
+    RETURNING) instead of loading rows first or reading them back.
     '''
+    _statement_cache: OrderedDict = OrderedDict()
+    # In-flight `read_by_id` queries (shared by all models)
+    read_flights = SingleFlight(timeout=READ_FLIGHT_TIMEOUT)
 
     @classmethod
     def apply_includes(cls, stmt, *args, **kwargs):
@@ -68,6 +94,141 @@ class CRUDMixin:
                         stmt = stmt.order_by(related_attr.desc() if desc else related_attr.asc())
         return stmt
 
+    @classmethod
+    def is_custom_ordered(cls, *args, **kwargs) -> bool:
+        '''
+        Check if includes/filters/orders sort by anything but ascending id.
+
+        Keyset pagination (`after_id`) seeks with `id > :after_id`, which
+        only pages correctly in that order.
+
+        Parameters
+        ----------
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes and filters (empty value - order).
+
+        Returns
+        -------
+        bool
+            True if the statement would be ordered by another key.
+        '''
+        orders = [arg for arg in args if isinstance(arg, str)]
+        orders += [
+            key for key, value in kwargs.items()
+            if not key.startswith('include_') and len(str(value)) == 0
+        ]
+        for order in orders:
+            desc = order[0] == '_'
+            name = order[1:] if desc else order
+            if getattr(cls, name, None) is not None and (desc or name != 'id'):
+                return True
+        return False
+
+    @classmethod
+    def build_statement(cls, base: str, *args, **kwargs) -> Tuple:
+        '''
+        Build (or reuse) the select statement for read_all / read_by_id.
+
+        Statements are cached per (model, base, orderings, include set,
+        filter keys, paging mode) as templates with bound parameters for
+        the values, so hot lookups skip statement construction and hit
+        SQLAlchemy's compiled cache with an already memoized cache key.
+
+        Parameters
+        ----------
+        base: str
+            'all' for read_all, 'id' for read_by_id (expects `item_id`).
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes, filters, limits, and offsets.
+
+        Returns
+        -------
+        tuple
+            statement and its bound parameter values.
+
+        Raises
+        ------
+        ValueError
+            if `after_id` is combined with a custom ordering.
+        '''
+        item_id = kwargs.get('item_id')
+        limit, offset, after_id = cls._paging(kwargs)
+        if after_id is not None and cls.is_custom_ordered(*args, **kwargs):
+            raise ValueError("Keyset pagination (after_id) only supports ordering by id")
+        if not all(isinstance(arg, str) for arg in args):
+            # Loader options aren't usable as cache keys, build with literals
+            stmt = cls._build_statement(base, args, kwargs, item_id, limit, offset, after_id)
+            return stmt, {}
+
+        params = {'item_id': item_id} if base == 'id' else {'offset': offset}
+        template_kwargs = {}
+        key = [cls, base, args]
+        for name, value in kwargs.items():
+            if name.startswith('include_'):
+                if getattr(cls, name[8:], None) is None:
+                    # Ignored by apply_includes, value left unparsed
+                    continue
+                template_kwargs[name] = int(value)
+                key.append((name, bool(int(value))))
+            elif getattr(cls, name[1:] if name[0] == '_' else name, None) is None:
+                continue
+            elif len(str(value)) > 0:
+                params[f'f_{name}'] = value
+                template_kwargs[name] = bindparam(f'f_{name}')
+                key.append((name, True))
+            else:
+                template_kwargs[name] = value
+                key.append((name, False))
+        if base == 'all':
+            if limit is not None:
+                params['limit'] = limit
+            if after_id is not None:
+                params['after_id'] = after_id
+            key.append((limit is not None, after_id is not None))
+
+        key = tuple(key)
+        stmt = cls._statement_cache.get(key)
+        if stmt is None:
+            stmt = cls._build_statement(
+                base, args, template_kwargs,
+                item_id=bindparam('item_id'),
+                limit=bindparam('limit') if 'limit' in params else None,
+                offset=bindparam('offset'),
+                after_id=bindparam('after_id') if 'after_id' in params else None,
+            )
+            cls._statement_cache[key] = stmt
+            if len(cls._statement_cache) > STATEMENT_CACHE_SIZE:
+                cls._statement_cache.popitem(last=False)
+        else:
+            # LRU: hot lookups outlive one-off filter combinations
+            cls._statement_cache.move_to_end(key)
+        return stmt, params
+
+    @staticmethod
+    def _paging(kwargs: dict) -> Tuple:
+        limit = int(kwargs.get('limit')) if str(kwargs.get('limit')).isdigit() else None
+        offset = int(kwargs.get('offset')) if str(kwargs.get('offset')).isdigit() else 0
+        after_id = int(kwargs.get('after_id')) if str(kwargs.get('after_id')).isdigit() else None
+        if after_id is not None:
+            offset = 0
+        return limit, offset, after_id
+
+    @classmethod
+    def _build_statement(cls, base, args, kwargs, item_id, limit, offset, after_id):
+        stmt = select(cls)
+        if base == 'id':
+            stmt = stmt.where(cls.id == item_id)
+        stmt = cls.apply_includes(stmt, *args, **kwargs)
+        if base == 'id':
+            return stmt.order_by(cls.id)
+        if after_id is not None:
+            stmt = stmt.where(cls.id > after_id)
+        return stmt.order_by(cls.id).limit(limit).offset(offset)
+
     @classmethod
     async def read_all(cls, session: AsyncSession, *args, **kwargs) -> AsyncIterator:
         '''
@@ -81,27 +242,66 @@ class CRUDMixin:
             positional arguments for includes and orders.
         **kwargs: dict
             keyword arguments for includes, filters, limits, and offsets.
+            `after_id` switches to keyset pagination over ids
+            (`WHERE id > after_id`), offset is ignored then and
+            custom orderings are rejected (ValueError).
 
         Returns
         -------
         AsyncIterator
             iterator of all objects.
         '''
-        stmt = select(cls)
-        stmt = cls.apply_includes(stmt, *args, **kwargs)
-        limit = int(kwargs.get('limit')) if str(kwargs.get('limit')).isdigit() else None
-        offset = int(kwargs.get('offset')) if str(kwargs.get('offset')).isdigit() else 0
-        stream = await session.stream_scalars(
-            stmt.order_by(cls.id).limit(limit).offset(offset)
-        )
+        stmt, params = cls.build_statement('all', *args, **kwargs)
+        stream = await session.stream_scalars(stmt, params)
         async for row in stream.unique():
             yield row
 
+    @classmethod
+    async def stream(
+        cls, session: AsyncSession, *args, batch_size: int = 1000, **kwargs
+    ) -> AsyncIterator[List]:
+        '''
+        Stream all matching objects in batches.
+
+        Rows are fetched `batch_size` at a time from a server-side cursor
+        (`yield_per`), the session's identity map only holds weak references,
+        so consumed batches are freed and memory stays flat whatever the
+        number of rows. No `unique()` pass: that would have to remember
+        every row seen.
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        batch_size: int
+            rows per fetched batch.
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes and filters, `after_id` resumes
+            after the given id.
+
+        Returns
+        -------
+        AsyncIterator
+            iterator of object batches.
+        '''
+        stmt, params = cls.build_statement('all', *args, **kwargs)
+        stream = await session.stream_scalars(
+            stmt, params, execution_options={'yield_per': batch_size}
+        )
+        async for batch in stream.partitions():
+            yield batch
+
     @classmethod
     async def read_by_id(cls, session: AsyncSession, item_id: int, *args, **kwargs):
         '''
         Read an object by its ID.
 
+        Concurrent plain reads (no includes/filters) of the same object share
+        one query (`read_flights`) when the session defines `read_scope()`,
+        the other sessions get their own copy of the loaded row.
+
         Parameters
         ----------
         session: AsyncSession
@@ -117,14 +317,51 @@ class CRUDMixin:
         -------
             object with the specified ID.
         '''
-        stmt = select(cls).where(cls.id == item_id)
-        stmt = cls.apply_includes(stmt, *args, **kwargs)
-        return await session.scalar(stmt.order_by(cls.id))
+        stmt, params = cls.build_statement('id', *args, item_id=item_id, **kwargs)
+        # Sessions opt in by telling where their reads go, None - not shareable
+        read_scope = getattr(session.sync_session, 'read_scope', None)
+        scope = read_scope() if read_scope is not None else None
+        if args or kwargs or scope is None:
+            return await session.scalar(stmt, params)
+
+        values, shared = await cls.read_flights.do(
+            (cls, item_id, session.bind, scope),
+            lambda: session.scalar(stmt, params), share=cls._snapshot
+        )
+        if not shared or values is None:
+            return values
+        existing = session.identity_map.get(identity_key(cls, item_id))
+        if existing is not None:
+            # Like a query: loaded objects of the session are kept as they are
+            return existing
+        instance = cls(**values)
+        make_transient_to_detached(instance)
+        return await session.merge(instance, load=False)
+
+    @classmethod
+    def _snapshot(cls, instance) -> Optional[Dict]:
+        # Loaded column values, handed to other sessions by coalesced reads
+        if instance is None:
+            return None
+        loaded = inspect(instance).dict
+        return {
+            attr.key: loaded[attr.key]
+            for attr in inspect(cls).column_attrs if attr.key in loaded
+        }
+
+    @classmethod
+    def _column_values(cls, kwargs: dict) -> Dict:
+        # Known columns only, None means "not set" (partial updates)
+        columns = cls.__table__.columns
+        return {
+            key: value for key, value in kwargs.items()
+            if key in columns and value is not None
+        }
 
     @classmethod
     async def create(cls, session: AsyncSession, **kwargs):
         '''
-        Create a new object.
+        Create a new object (INSERT ... RETURNING).
 
         Parameters
         ----------
@@ -142,15 +379,38 @@ class CRUDMixin:
         RuntimeError
             if object creation fails.
         '''
-        item = cls(**kwargs)
-        session.add(item)
+        new_item = await session.scalar(insert(cls).values(**kwargs).returning(cls))
         await session.commit()
-        new_item = await cls.read_by_id(session, item_id=item.id)
         if new_item:
             return new_item
         else:
             raise RuntimeError("Failed to create item")
 
+    @classmethod
+    async def create_many(cls, session: AsyncSession, rows: List[dict]) -> List:
+        '''
+        Create several objects with one (batched) INSERT ... RETURNING.
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        rows: List[dict]
+            attributes of every object.
+
+        Returns
+        -------
+        List
+            created objects, in the order of rows.
+        '''
+        if not rows:
+            return []
+        new_items = (await session.scalars(
+            insert(cls).returning(cls, sort_by_parameter_order=True), rows
+        )).all()
+        await session.commit()
+        return new_items
+
     @classmethod
     async def update(cls, session: AsyncSession, item, **kwargs):
         '''
@@ -176,6 +436,57 @@ class CRUDMixin:
             await session.commit()
         return item
 
+    @classmethod
+    async def update_by_id(cls, session: AsyncSession, item_id: int, **kwargs):
+        '''
+        Update an object by its ID (UPDATE ... WHERE id = :id RETURNING).
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        item_id: int
+            ID of an object.
+        **kwargs: dict
+            attributes to update (unknown keys and None values are skipped).
+
+        Returns
+        -------
+            updated object, None if it doesn't exist.
+        '''
+        values = cls._column_values(kwargs)
+        if not values:
+            return await cls.read_by_id(session, item_id)
+        item = await session.scalar(
+            update(cls).where(cls.id == item_id).values(**values).returning(cls),
+            execution_options={'populate_existing': True}
+        )
+        await session.commit()
+        return item
+
+    @classmethod
+    async def update_many(cls, session: AsyncSession, rows: List[dict]) -> int:
+        '''
+        Update several objects by their IDs (executemany UPDATE).
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        rows: List[dict]
+            attributes to update, every row must contain the object's `id`.
+
+        Returns
+        -------
+        int
+            number of rows passed to the UPDATE.
+        '''
+        if not rows:
+            return 0
+        await session.execute(update(cls), rows)
+        await session.commit()
+        return len(rows)
+
     @classmethod
     async def delete(cls, session: AsyncSession, item) -> None:
         '''
@@ -190,3 +501,28 @@ class CRUDMixin:
         '''
         await session.delete(item)
         await session.commit()
+
+    @classmethod
+    async def delete_by_id(cls, session: AsyncSession, item_id: int) -> Optional[int]:
+        '''
+        Delete an object by its ID (DELETE ... RETURNING id).
+
+        Related rows are removed by the database (ON DELETE CASCADE).
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        item_id: int
+            ID of an object.
+
+        Returns
+        -------
+        Optional[int]
+            ID of the deleted object, None if it doesn't exist.
+        '''
+        deleted_id = await session.scalar(
+            delete(cls).where(cls.id == item_id).returning(cls.id)
+        )
+        await session.commit()
+        return deleted_id
@@ -0,0 +1 @@
+from .shared_table import SharedTable, SharedTableFullError
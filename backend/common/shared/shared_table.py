@@ -0,0 +1,143 @@
+import os
+import mmap
+import time
+import fcntl
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+MAGIC = b'SHTABLE1'
+# magic, number of slots
+HEADER = struct.Struct('<8sQ')
+# key, value (key 0 marks an empty slot)
+SLOT = struct.Struct('<qq')
+VALUE = struct.Struct('<q')
+KEY = struct.Struct('<q')
+# Fibonacci hashing multiplier, spreads sequential keys (user ids) over the table
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class SharedTableFullError(RuntimeError):
+    '''
+    Raised when a shared table has no free slot left
+    '''
+
+
+class SharedTable:
+    '''
+    Fixed-size int64 -> int64 hash table in a shared memory-mapped file
+
+    Every process mapping the same file (gunicorn workers, preloaded or
+    not) sees the same entries. Lookups are lock-free reads of the mapping;
+    writes take a POSIX record lock on the file, write the value before the
+    key, and never empty a slot, so concurrent readers see either the old or
+    the new entry and never a broken probe chain.
+
+    With `expiring`, values are unix timestamps and slots whose value is in
+    the past are reused by new keys, so a table of short-lived entries
+    (e.g. revoked tokens until their `exp`) doesn't fill up.
+
+    Note: keys must be non-zero. Place the file on a tmpfs (`/dev/shm`) to
+    keep it off the disk.
+
+    Parameters
+    ----------
+    path: str
+        backing file, created (or reset if its size doesn't match) on open.
+    slots: int
+        table capacity, keep it well above the expected number of keys.
+    expiring: bool
+        values are expiry timestamps, expired slots are reusable.
+    '''
+
+    def __init__(self, path: str, slots: int, expiring: bool = False):
+        self.path = path
+        self.slots = slots
+        self.expiring = expiring
+        self._lock = threading.Lock()
+        size = HEADER.size + slots * SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._write_lock():
+            header = os.pread(self._fd, HEADER.size, 0)
+            if os.fstat(self._fd).st_size != size or header != HEADER.pack(MAGIC, slots):
+                # New file or another layout: start from an empty table
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, slots), 0)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _write_lock(self):
+        # Record locks are per process (unlike flock, shared by forked children),
+        # the thread lock covers writers within the process
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, key: int):
+        start = ((key * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) % self.slots
+        for probe in range(self.slots):
+            yield HEADER.size + ((start + probe) % self.slots) * SLOT.size
+
+    def get(self, key: int) -> Optional[int]:
+        '''
+        Value of a key, None if missing
+        '''
+        for offset in self._offsets(key):
+            slot_key, value = SLOT.unpack_from(self._map, offset)
+            if slot_key == key:
+                return value
+            if slot_key == 0:
+                return None
+        return None
+
+    def update(self, key: int, function: Callable[[Optional[int]], int]) -> int:
+        '''
+        Atomically replace the value of a key with `function(old value or None)`
+
+        :raises SharedTableFullError: if the key is new and no slot is free.
+        :returns: the new value.
+        :rtype: int
+        '''
+        with self._write_lock():
+            now = time.time()
+            reusable = None
+            for offset in self._offsets(key):
+                slot_key, value = SLOT.unpack_from(self._map, offset)
+                if slot_key == key:
+                    value = function(value)
+                    VALUE.pack_into(self._map, offset + KEY.size, value)
+                    return value
+                if slot_key == 0:
+                    break
+                if self.expiring and reusable is None and value <= now:
+                    reusable = offset
+            else:
+                offset = None
+            offset = reusable if reusable is not None else offset
+            if offset is None:
+                raise SharedTableFullError(f"Shared table {self.path} is full")
+            value = function(None)
+            VALUE.pack_into(self._map, offset + KEY.size, value)
+            KEY.pack_into(self._map, offset, key)
+            return value
+
+    def put(self, key: int, value: int) -> None:
+        '''
+        Set the value of a key
+        '''
+        self.update(key, lambda _: value)
+
+    def __len__(self) -> int:
+        return sum(
+            1 for slot in range(self.slots)
+            if KEY.unpack_from(self._map, HEADER.size + slot * SLOT.size)[0] != 0
+        )
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
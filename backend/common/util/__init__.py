@@ -1,4 +1,8 @@
 from .db_util import get_or_create
 from .meta_util import _AllOptionalMeta
 from .endpoint_util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params
+    update_object_or_raise_400, update_object_by_id_or_raise, delete_object_or_raise_404, \
+    process_query_params, encode_cursor, decode_cursor, keyset_paging_or_raise_400
+from .response_util import LoadedAttributes, orm_response, orm_list_response, \
+    orm_ndjson_response
+from .flight_util import SingleFlight
@@ -1,4 +1,6 @@
-from typing import Dict
+import base64
+import binascii
+from typing import Dict, Optional
 
 from fastapi import Request, status, HTTPException
 from sqlalchemy.exc import IntegrityError
@@ -57,14 +59,104 @@ async def update_object_or_raise_400(db_session: AsyncSession, item, item_instan
         ) from e
 
 
-def process_query_params(request: Request) -> Dict[str, str]:
+async def update_object_by_id_or_raise(db_session: AsyncSession, item, item_id: int, **kwargs):
+    """
+    Response pattern for single statement updates: 404 if the item doesn't
+    exist, 400 if the database rejects the new values
+    """
+    try:
+        instance = await item.update_by_id(db_session, item_id, **kwargs)
+    except IntegrityError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"[{item.__name__}] Foreign key constraint violated: " + str(e.__cause__)
+        ) from e
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"[{item.__name__}] Internal server error: " + str(e.__cause__)
+        ) from e
+
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{item.__name__} not found"
+        )
+    return instance
+
+
+async def delete_object_or_raise_404(db_session: AsyncSession, item, item_id: int) -> int:
+    """
+    Response pattern for single statement deletes if current item doesn't exist
+    """
+    deleted_id = await item.delete_by_id(db_session, item_id)
+    if deleted_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{item.__name__} not found"
+        )
+    return deleted_id
+
+
+def encode_cursor(item_id: int) -> str:
+    """
+    Opaque pagination cursor for the last seen id
+    """
+    return base64.urlsafe_b64encode(str(item_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """
+    Decode pagination cursor back into the last seen id
+    """
+    try:
+        item_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return int(item_id) if item_id.isdigit() else None
+
+
+def keyset_paging_or_raise_400(item, query_params: dict) -> bool:
+    """
+    Check if a listing can be paged by cursor (ordered by ascending id):
+    400 if `cursor`/`after_id` comes with another ordering
+    """
+    if not item.is_custom_ordered(**query_params):
+        return True
+    if str(query_params.get('after_id')).isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pagination cursors only support ordering by id"
+        )
+    return False
+
+
+def process_query_params(request: Request, max_limit: Optional[int] = 500) -> Dict[str, str]:
     """
     Process query parameters from a FastAPI Request object
+
+    `cursor` (from the `X-Next-Cursor` header) or `after_id` switch to
+    keyset pagination, which costs the same for any page depth.
+    `max_limit=None` leaves the page size uncapped (streamed exports)
     """
     query_params = dict(request.query_params)
     limit_q = query_params.get('limit', None)
     offset_q = query_params.get('offset', None)
-    query_params['limit'] = min(int(limit_q), 500) if str(limit_q).isdigit() else 500
+    if max_limit is None:
+        query_params['limit'] = int(limit_q) if str(limit_q).isdigit() else None
+    else:
+        query_params['limit'] = min(int(limit_q), max_limit) if str(limit_q).isdigit() \
+            else max_limit
     query_params['offset'] = offset_q if str(offset_q).isdigit() else 0
+    cursor_q = query_params.pop('cursor', None)
+    if cursor_q is not None:
+        after_id = decode_cursor(cursor_q)
+        if after_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        query_params['after_id'] = after_id
 
     return query_params
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class _LeaderCancelled(Exception):
+    '''
+    The caller running a shared call was cancelled, followers run their own
+    '''
+
+
+class SingleFlight(Generic[T]):
+    '''
+    Coalesces concurrent identical calls into one in-flight call
+
+    The first caller of a key (the leader) runs the call, callers arriving
+    while it's in flight (followers) wait for its outcome instead of
+    running their own: they get the shared result or the same exception.
+    A follower waits at most `timeout` seconds for the leader, then runs
+    the call itself. If the leader is cancelled (client gone, deadline),
+    its followers run their own call as well.
+
+    The leader's result is passed through `share` before it is handed to
+    the followers (e.g. to detach it from the leader's database session),
+    the leader itself gets the original result.
+
+    Attributes
+    ----------
+    timeout : Optional[float]
+        max wait of a follower (seconds), None - as long as the leader runs
+    calls : int
+        calls that ran
+    coalesced : int
+        calls served by another caller's in-flight call
+    '''
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(
+        self, key: Hashable, function: Callable[[], Awaitable[T]],
+        share: Optional[Callable[[T], Any]] = None, timeout: Optional[float] = None
+    ) -> Tuple[Any, bool]:
+        '''
+        Run `function` unless an identical call (`key`) is already in flight
+
+        :param key: identity of the call.
+        :type key: Hashable
+        :param function: coroutine function making the call.
+        :type function: Callable[[], Awaitable]
+        :param share: maps the result handed to followers.
+        :type share: Optional[Callable]
+        :param timeout: max follower wait for this key (default: `self.timeout`).
+        :type timeout: Optional[float]
+        :returns: result & whether it came from another caller's call (shared).
+        :rtype: Tuple[Any, bool]
+        '''
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.shield(flight), timeout if timeout is not None else self.timeout
+                )
+            except (_LeaderCancelled, asyncio.TimeoutError):
+                pass
+            else:
+                self.coalesced += 1
+                return result, True
+            # Leader gone or too slow, don't join another flight of the key
+            self.calls += 1
+            return await function(), False
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.calls += 1
+        try:
+            result = await function()
+            shared = share(result) if share is not None else result
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(shared)
+            return result, False
+        finally:
+            del self._flights[key]
+            if not flight.done():
+                # Cancelled (or interrupted) leader
+                flight.set_exception(_LeaderCancelled())
+            # Mark the exception as retrieved, there may be no follower to raise it
+            flight.exception()
@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, List, Optional, Type
+
+from fastapi import Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+
+
+class LoadedAttributes:
+    '''
+    Attribute view over the already loaded state of an ORM instance
+
+    Lets pydantic validate `from_attributes` straight from the instance
+    without copying its `__dict__` and without triggering lazy loads
+    (unloaded relationships are reported as missing, i.e. unset)
+    '''
+    __slots__ = ('_state',)
+
+    def __init__(self, instance):
+        self._state = instance.__dict__
+
+    def __getattr__(self, key: str):
+        try:
+            return self._state[key]
+        except KeyError as e:
+            raise AttributeError(key) from e
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def orm_response(
+    schema: Type[BaseModel], instance, status_code: int = status.HTTP_200_OK,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    Serialize an ORM instance to JSON in a single validation pass
+    """
+    model = schema.model_validate(LoadedAttributes(instance), from_attributes=True)
+    return Response(
+        model.model_dump_json(exclude_unset=True), status_code=status_code,
+        headers=headers, media_type="application/json"
+    )
+
+
+def orm_list_response(
+    schema: Type[BaseModel], instances: Iterable, status_code: int = status.HTTP_200_OK,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    Serialize ORM instances to a JSON array in a single validation pass
+    """
+    adapter = _list_adapter(schema)
+    models = adapter.validate_python(
+        [LoadedAttributes(instance) for instance in instances], from_attributes=True
+    )
+    return Response(
+        adapter.dump_json(models, exclude_unset=True), status_code=status_code,
+        headers=headers, media_type="application/json"
+    )
+
+
+def orm_ndjson_response(
+    schema: Type[BaseModel], batches: AsyncIterator[List], status_code: int = status.HTTP_200_OK,
+    headers: Optional[dict] = None
+) -> StreamingResponse:
+    """
+    Stream batches of ORM instances as newline-delimited JSON,
+    every batch is sent to the client as soon as it's serialized
+    """
+    async def body() -> AsyncIterator[bytes]:
+        async for batch in batches:
+            yield b''.join(
+                schema.model_validate(
+                    LoadedAttributes(instance), from_attributes=True
+                ).model_dump_json(exclude_unset=True).encode() + b'\n'
+                for instance in batch
+            )
+
+    return StreamingResponse(
+        body(), status_code=status_code, headers=headers, media_type="application/x-ndjson"
+    )
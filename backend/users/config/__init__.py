@@ -1 +1,12 @@
-from .config import ALLOWED_ORIGINS, LOG_FILE_PATH
+from .config import ALLOWED_ORIGINS, LOG_FILE_PATH, HASH_WORKERS, HASH_QUEUE_SIZE, \
+    AUTH_TRUST_CLAIMS, IMPORT_BATCH_SIZE, REFRESH_TOKEN_SWEEP_INTERVAL, \
+    REFRESH_TOKEN_SWEEP_BATCH, REFRESH_TOKEN_MAX_PER_USER, JWT_ALGORITHM, JWT_KEYS_DIR, \
+    JWT_ACTIVE_KID, JWT_KEYS_RELOAD_INTERVAL, JWKS_MAX_AGE, TOKEN_CACHE_SIZE, REQUEST_TIMEOUT, \
+    SQL_REPEAT_THRESHOLD, LOGIN_THROTTLE_WINDOW, LOGIN_THROTTLE_USER_LIMIT, \
+    LOGIN_THROTTLE_IP_LIMIT, LOGIN_THROTTLE_URL, EXPORT_BATCH_SIZE, \
+    PASSWORD_HASH_ALGORITHM, BCRYPT_ROUNDS, PASSWORD_HASH_TARGET_TIME, \
+    PASSWORD_HASH_ALLOW_LOWER_COST, ARGON2_TIME_COST, \
+    ARGON2_MEMORY_COST, ARGON2_PARALLELISM, \
+    SHARED_STATE_DIR, SHARED_STATE_SLOTS, \
+    WARMUP_ENABLED, WARMUP_CONNECTIONS, \
+    TOKEN_DENYLIST_PATH, TOKEN_DENYLIST_BLOOM_BITS, TOKEN_DENYLIST_BLOOM_HASHES
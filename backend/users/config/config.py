@@ -8,3 +8,69 @@ load_dotenv('./.env')
 
 ALLOWED_ORIGINS = env('ALLOWED_ORIGINS').split(',')
 LOG_FILE_PATH = env('LOG_FILE_PATH')
+# Default request budget (seconds), also bounds db statements on Postgres
+REQUEST_TIMEOUT = float(env('REQUEST_TIMEOUT', 5))
+# Executions of the same SQL statement within a request logged as a likely N+1 (0 disables)
+SQL_REPEAT_THRESHOLD = int(env('SQL_REPEAT_THRESHOLD', 10))
+
+# Password hashing executor (bcrypt runs in worker threads, off the event loop)
+HASH_WORKERS = int(env('HASH_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE_SIZE = int(env('HASH_QUEUE_SIZE', 64))
+# Password hashing policy, out of policy hashes are replaced on the next successful login
+PASSWORD_HASH_ALGORITHM = env('PASSWORD_HASH_ALGORITHM', 'bcrypt')
+BCRYPT_ROUNDS = int(env('BCRYPT_ROUNDS', 12))
+# Calibrate the cost at startup to this hashing time (seconds, 0 keeps the configured cost)
+PASSWORD_HASH_TARGET_TIME = float(env('PASSWORD_HASH_TARGET_TIME', 0))
+# Let the calibration pick a cost below BCRYPT_ROUNDS / ARGON2_TIME_COST
+PASSWORD_HASH_ALLOW_LOWER_COST = env('PASSWORD_HASH_ALLOW_LOWER_COST', 'False').lower() == 'true'
+# argon2id (needs argon2-cffi): iterations, memory (KiB) & lanes
+ARGON2_TIME_COST = int(env('ARGON2_TIME_COST', 3))
+ARGON2_MEMORY_COST = int(env('ARGON2_MEMORY_COST', 65536))
+ARGON2_PARALLELISM = int(env('ARGON2_PARALLELISM', 4))
+# Startup warm-up (pool connections, statement cache, JWT keys, hashing threads) before serving
+WARMUP_ENABLED = env('WARMUP_ENABLED', 'True').lower() == 'true'
+# Connections opened per engine during the warm-up
+WARMUP_CONNECTIONS = int(env('WARMUP_CONNECTIONS', 5))
+# Rows per INSERT batch for the bulk user import
+IMPORT_BATCH_SIZE = int(env('IMPORT_BATCH_SIZE', 1000))
+# Rows fetched per server-side cursor batch by the NDJSON user export
+EXPORT_BATCH_SIZE = int(env('EXPORT_BATCH_SIZE', 1000))
+
+# Login throttling: attempts per sliding window (seconds) per username & client IP (0 - unlimited)
+LOGIN_THROTTLE_WINDOW = float(env('LOGIN_THROTTLE_WINDOW', 60))
+LOGIN_THROTTLE_USER_LIMIT = int(env('LOGIN_THROTTLE_USER_LIMIT', 10))
+LOGIN_THROTTLE_IP_LIMIT = int(env('LOGIN_THROTTLE_IP_LIMIT', 100))
+# Shared counters for several workers/instances (redis:// url), in-process if empty
+LOGIN_THROTTLE_URL = env('LOGIN_THROTTLE_URL')
+
+# Build the authenticated principal from verified JWT claims (no user lookup)
+AUTH_TRUST_CLAIMS = env('AUTH_TRUST_CLAIMS', 'False').lower() == 'true'
+
+# Expired refresh token sweeper (seconds between sweeps, 0 disables) & rows per DELETE
+REFRESH_TOKEN_SWEEP_INTERVAL = int(env('REFRESH_TOKEN_SWEEP_INTERVAL', 300))
+REFRESH_TOKEN_SWEEP_BATCH = int(env('REFRESH_TOKEN_SWEEP_BATCH', 1000))
+# Max live sessions (refresh tokens) per user, oldest are evicted first (0 - unlimited)
+REFRESH_TOKEN_MAX_PER_USER = int(env('REFRESH_TOKEN_MAX_PER_USER', 10))
+
+# JWT signing: HS256 uses SECRET_KEY, RS256/ES256 use `<kid>.pem` keys from JWT_KEYS_DIR
+JWT_ALGORITHM = env('JWT_ALGORITHM', 'HS256')
+JWT_KEYS_DIR = env('JWT_KEYS_DIR')
+JWT_ACTIVE_KID = env('JWT_ACTIVE_KID')
+# How often workers check JWT_KEYS_DIR for added/removed keys (seconds, 0 - at startup only)
+JWT_KEYS_RELOAD_INTERVAL = int(env('JWT_KEYS_RELOAD_INTERVAL', 30))
+# Cache lifetime of /.well-known/jwks.json (seconds)
+JWKS_MAX_AGE = int(env('JWKS_MAX_AGE', 300))
+
+# Directory of the memory-mapped state shared by all workers (user token versions, revoked
+# tokens), in-process state if empty; set by the gunicorn config for multi-worker serving
+SHARED_STATE_DIR = env('SHARED_STATE_DIR')
+SHARED_STATE_SLOTS = int(env('SHARED_STATE_SLOTS', 262144))
+
+# Revoked access token ids: persistence file (in-process denylist, empty - not persisted)
+# & optional Bloom filter in front of it (bits, 0 disables)
+TOKEN_DENYLIST_PATH = env('TOKEN_DENYLIST_PATH')
+TOKEN_DENYLIST_BLOOM_BITS = int(env('TOKEN_DENYLIST_BLOOM_BITS', 0))
+TOKEN_DENYLIST_BLOOM_HASHES = int(env('TOKEN_DENYLIST_BLOOM_HASHES', 4))
+
+# Verified token payload cache (entries per process, 0 disables)
+TOKEN_CACHE_SIZE = int(env('TOKEN_CACHE_SIZE', 10000))
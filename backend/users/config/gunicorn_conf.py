@@ -0,0 +1,43 @@
+"""
+Multi-worker launcher: gunicorn managing uvicorn workers
+
+    gunicorn -c backend/users/config/gunicorn_conf.py backend.users.main:app
+
+The app is imported once in the master (`preload_app`) and forked into
+the workers, token versions and revocations live in memory-mapped tables
+under SHARED_STATE_DIR so every worker sees the same invalidations.
+"""
+import os
+import tempfile
+
+# Must be set before the app is imported (below, by preload_app)
+os.environ.setdefault(
+    'SHARED_STATE_DIR',
+    os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'users-api')
+)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+# Long enough for the streaming export & bulk import (they have no request deadline)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+logconfig = os.path.join(os.path.dirname(__file__), 'log.ini')
+
+
+def when_ready(server):
+    # Time password hashes once, before any worker competes for the cores,
+    # workers pick the stored cost up in their lifespan
+    from backend.users.service import password_service  # pylint: disable=C0415
+    password_service.calibrate_password_policy()
+
+
+def post_fork(server, worker):
+    # Pools created in the master must not be shared: drop the inherited
+    # references without closing connections the master still owns
+    from backend.users.service.db_service import async_engine, replica_set  # pylint: disable=C0415
+    async_engine.sync_engine.dispose(close=False)
+    for engine in replica_set.engines:
+        engine.sync_engine.dispose(close=False)
@@ -1,13 +1,23 @@
-import time
 import asyncio
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 
-from backend.users.config import ALLOWED_ORIGINS
-from backend.users.router import auth_router, user_router
+from backend.common.middleware import DeadlineMiddleware, MetricsMiddleware, QueryStatsMiddleware
+from backend.common.shared import SharedTableFullError
+from backend.users.config import ALLOWED_ORIGINS, REQUEST_TIMEOUT, SQL_REPEAT_THRESHOLD
+from backend.users.router import auth_router, user_router, jwks_router, metrics_router, \
+    health_router
+from backend.users.service.db_service import TEST
+from backend.users.service.hash_service import hash_executor, HashQueueFullError
+from backend.users.service.metrics_service import request_latency, requests_in_flight
+from backend.users.service.password_service import calibrate_password_policy
+from backend.users.service.refresh_token_service import refresh_token_sweeper
+from backend.users.service.warmup_service import warm_up
+from backend.users.util.auth_util import key_ring
 
 
 tags_metadata = [
@@ -21,6 +31,31 @@ tags_metadata = [
     }
 ]
 
+# Per-route request budgets (seconds), None - no deadline (bulk operations)
+ROUTE_TIMEOUTS = {
+    "/api/v1/user/import": None,
+    "/api/v1/user/export": None,
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    App startup/shutdown: password cost calibration, warm-up, background sweeper, JWT keys
+    reload & hashing pool
+    """
+    # Before any request is hashed with the new cost, reuses the cost the
+    # gunicorn master (or the first worker) calibrated
+    await asyncio.to_thread(calibrate_password_policy)
+    # Requests are accepted once the lifespan startup completes
+    await warm_up.run()
+    refresh_token_sweeper.start()
+    key_ring.start()
+    yield
+    await key_ring.stop()
+    await refresh_token_sweeper.stop()
+    hash_executor.shutdown()
+
 
 app = FastAPI(
     title="User/Auth API",
@@ -33,6 +68,7 @@ app = FastAPI(
     openapi_url='/api/openapi.json',
     openapi_tags=tags_metadata,
     docs_url=None, redoc_url=None,
+    lifespan=lifespan,
 )
 
 
@@ -43,29 +79,58 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+# Query count & db time per request (Server-Timing), query budgets are enforced in tests
+app.add_middleware(
+    QueryStatsMiddleware,
+    enforce_budget=TEST,
+    repeat_threshold=SQL_REPEAT_THRESHOLD
+)
+# Request deadline, its remaining budget becomes the db statement timeout
+app.add_middleware(
+    DeadlineMiddleware,
+    timeout=REQUEST_TIMEOUT,
+    route_timeouts=ROUTE_TIMEOUTS
+)
+# Latency by route & status (outermost, so timed out requests are counted as 504)
+app.add_middleware(
+    MetricsMiddleware,
+    latency=request_latency,
+    in_flight=requests_in_flight
+)
 
 app.include_router(auth_router, prefix="/api")
 app.include_router(user_router, prefix="/api")
+app.include_router(jwks_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+
+
+@app.exception_handler(HashQueueFullError)
+async def hash_queue_full_handler(request: Request, exc: HashQueueFullError):
+    """
+    Fast rejection when the password hashing queue is saturated
+    """
+    return JSONResponse(
+        {
+            'detail': str(exc),
+            'queue_depth': hash_executor.queue_depth
+        },
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
 
 
-@app.middleware("http")
-async def timeout_middleware(request: Request, call_next):
+@app.exception_handler(SharedTableFullError)
+async def shared_table_full_handler(request: Request, exc: SharedTableFullError):
     """
-    TIMEOUT Middleware, throws an error if request exceeds 5s
+    Token invalidations that can't be recorded (SHARED_STATE_SLOTS too low)
+    fail the request before its change is committed
     """
-    start_time = time.time()
-    try:
-        return await asyncio.wait_for(call_next(request), timeout=5)
-
-    except asyncio.TimeoutError:
-        process_time = time.time() - start_time
-        return JSONResponse(
-            {
-                'detail': 'Request processing time excedeed limit',
-                'processing_time': process_time
-            },
-            status_code=status.HTTP_504_GATEWAY_TIMEOUT
-        )
+    return JSONResponse(
+        {'detail': "Token invalidation state is full, try again later"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '60'}
+    )
 
 
 @app.get("/api/swagger", include_in_schema=False)
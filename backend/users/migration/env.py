@@ -32,6 +32,11 @@ target_metadata = Base.metadata
 
 
 def do_run_migrations(connection):
+    if connection.dialect.name == 'sqlite':
+        # Batch migrations recreate tables, with foreign keys enforced
+        # dropping a parent table would cascade into its children
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
     context.configure(
         compare_type=True,
         dialect_opts={"paramstyle": "named"},
@@ -0,0 +1,67 @@
+"""hash refresh tokens
+
+Revision ID: 739bbb0ff1e2
+Revises: 64664d713d01
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '739bbb0ff1e2'
+down_revision: Union[str, None] = '64664d713d01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+refresh_token = sa.table(
+    'refresh_token',
+    sa.column('id', sa.Integer()),
+    sa.column('token', sa.String()),
+)
+
+
+def upgrade() -> None:
+    # Backfill: replace raw tokens with their SHA-256 digest.
+    # Identical tokens issued within the same second collapse into one row.
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(refresh_token.c.id, refresh_token.c.token).order_by(refresh_token.c.id)
+    ).all()
+    seen = set()
+    for row_id, token in rows:
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        if digest in seen:
+            connection.execute(
+                refresh_token.delete().where(refresh_token.c.id == row_id)
+            )
+            continue
+        seen.add(digest)
+        connection.execute(
+            refresh_token.update().where(refresh_token.c.id == row_id).values(token=digest)
+        )
+
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.alter_column(
+            'token',
+            existing_type=sa.String(length=512),
+            type_=sa.String(length=64),
+            existing_nullable=False
+        )
+        batch_op.create_index('ix_refresh_token_token', ['token'], unique=True)
+
+
+def downgrade() -> None:
+    # Digests can't be turned back into tokens, existing sessions stay invalid
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.drop_index('ix_refresh_token_token')
+        batch_op.alter_column(
+            'token',
+            existing_type=sa.String(length=64),
+            type_=sa.String(length=512),
+            existing_nullable=False
+        )
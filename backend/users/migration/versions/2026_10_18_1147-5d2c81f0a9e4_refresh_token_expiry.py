@@ -0,0 +1,48 @@
+"""refresh token expiry
+
+Revision ID: 5d2c81f0a9e4
+Revises: 739bbb0ff1e2
+Create Date: 2026-10-18 11:47:05.613092
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c81f0a9e4'
+down_revision: Union[str, None] = '739bbb0ff1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# REFRESH_TOKEN_EXPIRE_DAYS at the time of the migration
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+
+
+def upgrade() -> None:
+    op.add_column(
+        'refresh_token',
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    # Stored tokens are digests, their real expiry is unknown:
+    # assume the longest possible lifetime from now.
+    refresh_token = sa.table('refresh_token', sa.column('expires_at', sa.DateTime(timezone=True)))
+    op.execute(
+        refresh_token.update().values(
+            expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        )
+    )
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.alter_column(
+            'expires_at', existing_type=sa.DateTime(timezone=True), nullable=False
+        )
+        batch_op.create_index('ix_refresh_token_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.drop_index('ix_refresh_token_expires_at')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,35 @@
+"""refresh token cascade
+
+Revision ID: a3f19c7d5e42
+Revises: 5d2c81f0a9e4
+Create Date: 2026-10-18 15:23:11.482907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f19c7d5e42'
+down_revision: Union[str, None] = '5d2c81f0a9e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Postgres' default name of the initial (unnamed) constraint,
+# the naming convention gives SQLite's reflected one the same name
+FK_NAME = 'refresh_token_user_id_fkey'
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def upgrade() -> None:
+    # Deleting a user removes their refresh tokens in the same statement
+    with op.batch_alter_table('refresh_token', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'user', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('refresh_token', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'user', ['user_id'], ['id'])
@@ -1,4 +1,4 @@
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, DateTime
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from backend.users.model.base import Base
@@ -15,7 +15,9 @@ class RefreshToken(Base, CRUDMixin):
     user_id : int
         id of the user associated with the record
     token : str
-        valid refresh token
+        SHA-256 hex digest of a valid refresh token
+    expires_at : datetime
+        token expiration time (UTC)
     '''
     __tablename__ = "refresh_token"
 
@@ -23,10 +25,13 @@ class RefreshToken(Base, CRUDMixin):
         "id", autoincrement=True, nullable=False, unique=True, primary_key=True
     )
     user_id: Mapped[int] = mapped_column(
-        "user_id", ForeignKey('user.id'), nullable=False
+        "user_id", ForeignKey('user.id', ondelete='CASCADE'), nullable=False
     )
     token: Mapped[str] = mapped_column(
-        "token", String(length=512), nullable=False
+        "token", String(length=64), nullable=False, unique=True, index=True
+    )
+    expires_at: Mapped[DateTime] = mapped_column(
+        "expires_at", DateTime(timezone=True), nullable=False, index=True
     )
 
     user: Mapped[User] = relationship(
@@ -49,5 +49,6 @@ class User(Base, CRUDMixin):
     )
 
     refresh_tokens: Mapped[List[RefreshToken]] = relationship(
-        'RefreshToken', cascade='all, delete-orphan', back_populates='user'
+        'RefreshToken', cascade='all, delete-orphan', back_populates='user',
+        passive_deletes=True
     )
@@ -1,2 +1,5 @@
 from .auth_router import router as auth_router
 from .user_router import router as user_router
+from .jwks_router import router as jwks_router
+from .metrics_router import router as metrics_router
+from .health_router import router as health_router
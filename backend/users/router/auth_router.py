@@ -1,17 +1,23 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, status, Request, Response, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.common.middleware import query_budget
 from backend.common.util import create_object_or_raise_400
 from backend.users.util import authenticate_user, create_access_token, \
     REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES, \
-    auth_user
+    auth_user, authenticate_token, get_token_data, get_refresh_token_data, hash_token, \
+    throttle_login, oauth2_scheme, decode_token
 from backend.users.model import RefreshToken
 from backend.users.schema import TokenSchema, UserSchema
-from backend.users.service.db_service import get_session
+from backend.users.service.db_service import get_session, current_user_id, use_primary
+from backend.users.service.denylist_service import token_denylist
+from backend.users.service.refresh_token_service import refresh_token_sweeper
+from backend.users.service.token_service import token_cache
 
 router = APIRouter(
     prefix="/v1/auth",
@@ -19,7 +25,12 @@ router = APIRouter(
 )
 
 
-@router.post("/token", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/token", status_code=status.HTTP_201_CREATED,
+    # Throttled attempts are rejected before the user lookup & bcrypt,
+    # one extra UPDATE when the password hash is upgraded to the current policy
+    dependencies=[Depends(throttle_login), Depends(query_budget(4))]
+)
 async def login_for_access_token(
     request: Request,
     response: Response,
@@ -35,7 +46,9 @@ async def login_for_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    token_data = {"user_id": user.id, "username": user.username, "is_admin": user.is_admin}
+    # The new session is read back on refresh, keep the user on the primary
+    current_user_id.set(user.id)
+    token_data = get_token_data(user.id, user.username, user.is_admin)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data=token_data,
@@ -43,12 +56,14 @@ async def login_for_access_token(
     )
     refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     refresh_token = create_access_token(
-        data=token_data,
+        data=get_refresh_token_data(token_data),
         expires_delta=refresh_token_expires
     )
     await create_object_or_raise_400(
-        db_session, RefreshToken, user_id=user.id, token=refresh_token
+        db_session, RefreshToken, user_id=user.id, token=hash_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + refresh_token_expires
     )
+    await refresh_token_sweeper.enforce_cap(db_session, user.id)
     response.set_cookie(
         key="refresh_token",
         value=refresh_token,
@@ -59,7 +74,10 @@ async def login_for_access_token(
     return TokenSchema(refresh_token=refresh_token, access_token=access_token, token_type="bearer")
 
 
-@router.post("/refresh", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/refresh", status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(2))]
+)
 async def refresh_access_token(
     request: Request,
     response: Response,
@@ -73,10 +91,10 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    # Verify that the refresh token is in the database
+    # Verify that the refresh token is in the database (primary, no replication lag)
     refresh_token_instance = [
         refresh_token async for refresh_token in RefreshToken.read_all(
-            db_session, token=refresh_token
+            use_primary(db_session), token=hash_token(refresh_token)
         )
     ]
     if len(refresh_token_instance) == 0:
@@ -86,14 +104,10 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    user = await auth_user(refresh_token, db_session)
+    user = await authenticate_token(refresh_token, db_session, allow_refresh=True)
 
     # Generate a new access token
-    token_data = {
-        "user_id": user['id'],
-        "username": user['username'],
-        "is_admin": user['is_admin']
-    }
+    token_data = get_token_data(user['id'], user['username'], user['is_admin'])
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data=token_data,
@@ -103,11 +117,15 @@ async def refresh_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@router.post(
+    "/logout", status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(query_budget(3))]
+)
 async def logout(
     request: Request,
     response: Response,
     current_user: Annotated[UserSchema, Depends(auth_user)],
+    token: Annotated[str, Depends(oauth2_scheme)],
     db_session: AsyncSession = Depends(get_session)
 ):
     refresh_token = request.cookies.get("refresh_token")
@@ -121,7 +139,7 @@ async def logout(
     # Delete the specific refresh token from the database
     refresh_token_instance = [
         refresh_token async for refresh_token in RefreshToken.read_all(
-            db_session, token=refresh_token
+            use_primary(db_session), token=hash_token(refresh_token)
         )
     ]
     if len(refresh_token_instance) == 0:
@@ -130,7 +148,19 @@ async def logout(
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"}
         )
+    # Both tokens stay valid bearer credentials until `exp` otherwise (refresh
+    # tokens issued before `typ` was added are accepted by auth_user). Revoked
+    # before the delete, so a full shared table fails the request (503) before
+    # anything is committed, like update_user
+    for revoked in (token, refresh_token):
+        try:
+            payload = decode_token(revoked)
+        except JWTError:
+            continue
+        if payload.get("jti") and payload.get("exp"):
+            token_denylist.revoke(payload["jti"], payload["exp"])
     await RefreshToken.delete(db_session, refresh_token_instance[0])
+    token_cache.invalidate(refresh_token)
 
     # Clear the refresh token cookie
     response.delete_cookie("refresh_token")
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from backend.users.service.warmup_service import warm_up
+
+router = APIRouter()
+
+
+@router.get("/health", include_in_schema=False)
+async def read_liveness():
+    """
+    Liveness probe, the process is serving requests
+    """
+    return {"status": "ok"}
+
+
+@router.get("/health/ready", include_in_schema=False)
+async def read_readiness():
+    """
+    Readiness probe, 503 until the startup warm-up has finished
+    """
+    return JSONResponse(
+        {"ready": warm_up.ready, "warmup": warm_up.report},
+        status_code=status.HTTP_200_OK if warm_up.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
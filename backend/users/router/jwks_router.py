@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Request, Response, status
+
+from backend.users.config import JWKS_MAX_AGE
+from backend.users.util import key_ring
+
+router = APIRouter(
+    prefix="/.well-known",
+    tags=['Auth']
+)
+
+
+@router.get("/jwks.json", status_code=status.HTTP_200_OK)
+async def read_jwks(request: Request):
+    """
+    Public signing keys, so other services can verify tokens locally
+    """
+    headers = {
+        'Cache-Control': f'public, max-age={JWKS_MAX_AGE}',
+        'ETag': key_ring.etag,
+    }
+    if request.headers.get('if-none-match') == key_ring.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(key_ring.jwks(), media_type="application/jwk-set+json", headers=headers)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+
+from backend.users.service.metrics_service import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Service metrics in the Prometheus text format
+    """
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,14 +1,22 @@
 from typing import List, Annotated
 
 from fastapi import APIRouter, Depends, Path, status, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.common.middleware import query_budget
 from backend.common.util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params
+    update_object_by_id_or_raise, delete_object_or_raise_404, process_query_params, \
+    encode_cursor, keyset_paging_or_raise_400, orm_response, orm_list_response, \
+    orm_ndjson_response
+from backend.users.config import IMPORT_BATCH_SIZE, EXPORT_BATCH_SIZE
 from backend.users.util import get_password_hash, auth_user, auth_admin
 from backend.users.model import User
-from backend.users.schema import UserSchema, PartialUserSchema, UserResponse
-from backend.users.service.db_service import get_session
+from backend.users.schema import UserSchema, PartialUserSchema, UserResponse, \
+    UserImportReport
+from backend.users.service.db_service import get_session, AsyncSessionFactory
+from backend.users.service.import_service import import_users, parse_rows
+from backend.users.service.token_service import user_versions
 
 
 router = APIRouter(
@@ -18,7 +26,8 @@ router = APIRouter(
 
 
 @router.get(
-    "/", status_code=status.HTTP_200_OK, dependencies=[Depends(auth_admin)],
+    "/", status_code=status.HTTP_200_OK,
+    dependencies=[Depends(auth_admin), Depends(query_budget(2))],
     response_model=List[UserResponse], response_model_exclude_unset=True
 )
 async def read_all_users(
@@ -26,28 +35,62 @@ async def read_all_users(
     db_session: AsyncSession = Depends(get_session)
 ):
     query_params: dict = process_query_params(request)
-    return [
-        UserResponse(**user.__dict__).model_dump(exclude_unset=True)
-        async for user in User.read_all(
+    keyset = keyset_paging_or_raise_400(User, query_params)
+    users = [
+        user async for user in User.read_all(
             db_session,
             **query_params
         )
     ]
+    headers = None
+    if keyset and users and len(users) == query_params['limit']:
+        # Full page, there may be more rows: `?cursor=` seeks past the last id
+        headers = {'X-Next-Cursor': encode_cursor(users[-1].id)}
+    return orm_list_response(UserResponse, users, headers=headers)
 
 
 @router.get(
-    "/me", status_code=status.HTTP_200_OK,
+    "/export", status_code=status.HTTP_200_OK, dependencies=[Depends(auth_admin)],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def export_users(request: Request):
+    """
+    Stream all matching users as JSON Lines (same filters & paging as the
+    list, without the 500 rows cap)
+    """
+    query_params: dict = process_query_params(request, max_limit=None)
+    keyset_paging_or_raise_400(User, query_params)
+
+    async def batches():
+        # The request's session is closed once the response starts streaming
+        async with AsyncSessionFactory() as db_session:
+            async for users in User.stream(
+                db_session, batch_size=EXPORT_BATCH_SIZE, **query_params
+            ):
+                yield users
+
+    return orm_ndjson_response(UserResponse, batches())
+
+
+@router.get(
+    "/me", status_code=status.HTTP_200_OK, dependencies=[Depends(query_budget(2))],
     response_model=UserResponse, response_model_exclude_unset=True
 )
 async def read_user_me(
     request: Request,
-    current_user: Annotated[UserSchema, Depends(auth_user)]
+    current_user: Annotated[UserSchema, Depends(auth_user)],
+    db_session: AsyncSession = Depends(get_session)
 ):
-    return current_user
+    user = current_user['user']
+    if user is None:
+        # Token claims only carry the principal (AUTH_TRUST_CLAIMS), load the full profile
+        user = await get_object_or_raise_404(db_session, User, current_user['id'])
+    return orm_response(UserResponse, user)
 
 
 @router.get(
-    "/{user_id}", status_code=status.HTTP_200_OK,
+    "/{user_id}", status_code=status.HTTP_200_OK, dependencies=[Depends(query_budget(2))],
     response_model=UserResponse, response_model_exclude_unset=True
 )
 async def read_user(
@@ -60,7 +103,7 @@ async def read_user(
         user = await get_object_or_raise_404(
             db_session, User, user_id,
         )
-        return UserResponse(**user.__dict__).model_dump(exclude_unset=True)
+        return orm_response(UserResponse, user)
 
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
@@ -70,6 +113,7 @@ async def read_user(
 
 @router.post(
     "/register", status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(1))],
     response_model=UserResponse, response_model_exclude_unset=True
 )
 async def create_user(
@@ -78,11 +122,34 @@ async def create_user(
 ):
     payload.password = await get_password_hash(payload.password)
     user = await create_object_or_raise_400(db_session, User, **payload.model_dump())
-    return UserResponse(**user.__dict__).model_dump(exclude_unset=True)
+    return orm_response(UserResponse, user, status_code=status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/import", status_code=status.HTTP_200_OK, dependencies=[Depends(auth_admin)],
+    response_model=UserImportReport,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    }
+)
+async def import_users_bulk(
+    request: Request,
+    db_session: AsyncSession = Depends(get_session)
+):
+    fmt = 'csv' if 'csv' in request.headers.get('content-type', '') else 'jsonl'
+    return await import_users(
+        db_session, parse_rows(request.stream(), fmt), IMPORT_BATCH_SIZE
+    )
 
 
 @router.patch(
-    "/{user_id}", status_code=status.HTTP_200_OK,
+    "/{user_id}", status_code=status.HTTP_200_OK, dependencies=[Depends(query_budget(2))],
     response_model=UserResponse, response_model_exclude_unset=True
 )
 async def update_user(
@@ -93,11 +160,20 @@ async def update_user(
     db_session: AsyncSession = Depends(get_session)
 ):
     if (user_id == current_user['id'] and payload.is_admin is None) or current_user['is_admin']:
-        user = await get_object_or_raise_404(db_session, User, user_id)
         if payload.password:
             payload.password = await get_password_hash(payload.password)
-        await update_object_or_raise_400(db_session, User, user, **payload.model_dump())
-        return UserResponse(**user.__dict__).model_dump(exclude_unset=True)
+        # Token claims are out of date now: bumped before the write, so a full
+        # shared table fails the request (503) before anything is committed
+        invalidates = payload.username is not None or payload.is_admin is not None
+        if invalidates:
+            user_versions.bump(user_id)
+        user = await update_object_by_id_or_raise(
+            db_session, User, user_id, **payload.model_dump()
+        )
+        if invalidates:
+            # Again for tokens issued meanwhile (in place, can't fail)
+            user_versions.bump(user_id)
+        return orm_response(UserResponse, user)
 
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
@@ -106,7 +182,8 @@ async def update_user(
 
 
 @router.delete(
-    "/{user_id}", status_code=status.HTTP_204_NO_CONTENT
+    "/{user_id}", status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(query_budget(2))]
 )
 async def delete_user(
     request: Request,
@@ -114,8 +191,11 @@ async def delete_user(
     user_id: int = Path(...), db_session: AsyncSession = Depends(get_session)
 ):
     if (user_id == current_user['id']) or current_user['is_admin']:
-        user = await get_object_or_raise_404(db_session, User, user_id)
-        await User.delete(db_session, user)
+        # Before & after the delete, like update_user
+        user_versions.bump(user_id)
+        # Refresh tokens go with the user (ON DELETE CASCADE)
+        await delete_object_or_raise_404(db_session, User, user_id)
+        user_versions.bump(user_id)
     else:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -1,4 +1,4 @@
 from .user_schema import UserSchema, PartialUserSchema, \
-    IndependentUserSchema, UserResponse
+    IndependentUserSchema, UserResponse, UserImportSchema, UserImportIssue, UserImportReport
 from .auth_schema import AccessTokenSchema, TokenSchema, RefreshTokenSchema, \
     PartialRefreshTokenSchema, IndependentRefreshTokenSchema, RefreshTokenResponse
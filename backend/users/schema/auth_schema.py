@@ -38,7 +38,7 @@ class RefreshTokenSchema(BaseModel):
     Attributes:
     ----------
     - user_id: identifier of the user associated with the entry.
-    - token: generated refresh token according to user's entry.
+    - token: digest of the generated refresh token.
     """
     user_id: int
     token: str
@@ -60,7 +60,7 @@ class IndependentRefreshTokenSchema(RefreshTokenSchema):
     ----------
     - id: unique identifier of the token.
     - user_id: identifier of the user associated with the entry.
-    - token: generated refresh token according to user's entry.
+    - token: digest of the generated refresh token.
     """
     id: int
 
@@ -73,5 +73,5 @@ class RefreshTokenResponse(IndependentRefreshTokenSchema):
     ----------
     - id: unique identifier of the token.
     - user_id: identifier of the user associated with the entry.
-    - token: generated refresh token according to user's entry.
+    - token: digest of the generated refresh token.
     """
@@ -56,3 +56,46 @@ class UserResponse(IndependentUserSchema):
     - refresh_tokens: refresh tokens related to the user.
     """
     refresh_tokens: Optional[List[IndependentRefreshTokenSchema]] = None
+
+
+class UserImportSchema(UserSchema):
+    """
+    Pydantic schema for a bulk import row.
+
+    Attributes:
+    ----------
+    - username: username.
+    - password: user's plain text password.
+    - is_admin: does user have admin rights.
+    """
+    is_admin: bool = False
+
+
+class UserImportIssue(BaseModel):
+    """
+    Pydantic schema for a rejected bulk import row.
+
+    Attributes:
+    ----------
+    - line: line number in the uploaded body.
+    - username: username of the row (if parsed).
+    - detail: rejection reason.
+    """
+    line: int
+    username: Optional[str] = None
+    detail: str
+
+
+class UserImportReport(BaseModel):
+    """
+    Pydantic schema for the bulk import result.
+
+    Attributes:
+    ----------
+    - created: number of inserted users.
+    - conflicts: rows skipped because the username already exists.
+    - errors: rows that couldn't be parsed or validated.
+    """
+    created: int = 0
+    conflicts: List[UserImportIssue] = []
+    errors: List[UserImportIssue] = []
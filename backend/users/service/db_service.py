@@ -1,8 +1,17 @@
 import os
-from typing import AsyncIterator
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, \
+    create_async_engine
+
+from backend.common.metrics import Counter, Histogram
+from backend.common.middleware import remaining_budget, instrument_engine, UNCOUNTED
 
 env = os.environ.get
 load_dotenv('./.env')
@@ -14,24 +23,250 @@ POSTGRE_CON = (
     f"postgresql+asyncpg://{env('POSTGRES_USER')}:{env('POSTGRES_PASSWORD')}"
     f"@{env('POSTGRES_HOST')}:{env('POSTGRES_PORT')}/{env('POSTGRES_DB')}"
 )
-ENGINE_PARAMS = {
-    'url': f'sqlite+aiosqlite:///{"test_users" if TEST else "users"}.db'
-    if (DEBUG or TEST) else POSTGRE_CON,
-    'pool_pre_ping': True,
-    'echo': False
-}
+DATABASE_URL = env('DATABASE_URL') or (
+    f'sqlite+aiosqlite:///{"test_users" if TEST else "users"}.db'
+    if (DEBUG or TEST) else POSTGRE_CON
+)
+# Read replicas (comma separated urls, empty - everything goes to the primary)
+DATABASE_REPLICA_URLS = [url for url in (env('DATABASE_REPLICA_URLS') or '').split(',') if url]
+# Seconds a user's reads stay on the primary after they wrote (replication lag)
+REPLICA_READ_AFTER_WRITE = float(env('REPLICA_READ_AFTER_WRITE', 5))
+# Seconds a failed replica is skipped before being tried again
+REPLICA_RETRY_INTERVAL = float(env('REPLICA_RETRY_INTERVAL', 30))
+
+pool_wait = Histogram(
+    'db_pool_wait_seconds', 'Time to check a connection out of the pool (wait & pre-ping)',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+)
+pool_checkouts = Counter('db_pool_checkouts', 'Connections checked out of the pool')
+
+
+class TimedPoolMixin:
+    '''
+    Records connection checkout time into `pool_wait`
+    '''
+
+    def connect(self):
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_wait.observe(time.perf_counter() - start_time)
+
+
+class TimedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(TimedPoolMixin, NullPool):
+    pass
+
+
+# DATABASE_URL overrides the defaults (e.g. benchmarks against a dedicated db)
+# File based SQLite keeps SQLAlchemy's default of no pooling
+def engine_params(url: str) -> dict:
+    return {
+        'url': url,
+        'poolclass': TimedNullPool if url.startswith('sqlite') else TimedQueuePool,
+        'pool_pre_ping': True,
+        'echo': False
+    }
+
+
+ENGINE_PARAMS = engine_params(DATABASE_URL)
 SESSION_PARAMS = {
     'autoflush': False,
     'expire_on_commit': False,
     'future': True
 }
 
-# API engine settings (default poolclass to maintain pool of db connections)
-async_engine = create_async_engine(
-    **ENGINE_PARAMS
+
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_checkouts.inc()
+
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite doesn't enforce foreign keys (ON DELETE CASCADE) unless asked to
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """
+    Async engine with the app's pool & per-request query instrumentation
+    """
+    engine = create_async_engine(**engine_params(url))
+    # Per-request query count & db time (QueryStatsMiddleware)
+    instrument_engine(engine.sync_engine)
+    event.listen(engine.sync_engine, 'checkout', count_checkout)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', enable_sqlite_foreign_keys)
+    return engine
+
+
+# API engine settings (primary, all writes go here)
+async_engine = create_engine(DATABASE_URL)
+
+# Authenticated user of the current request (read-your-writes routing)
+current_user_id: ContextVar[Optional[int]] = ContextVar('current_user_id', default=None)
+
+
+class ReplicaSet:
+    '''
+    Read replicas with round-robin selection & health-based failover
+
+    A replica whose connection fails is skipped for `retry_interval`
+    seconds, reads fall back to the primary when none is available. Users
+    who just wrote are pinned to the primary for `read_after_write` seconds,
+    so they read their own writes despite replication lag.
+
+    Attributes
+    ----------
+    engines : List[AsyncEngine]
+        replica engines
+    reads : int
+        reads routed to a replica
+    failures : int
+        number of times a replica was marked down
+    '''
+
+    def __init__(
+        self, engines: List[AsyncEngine], read_after_write: float, retry_interval: float
+    ):
+        self.engines = engines
+        self.read_after_write = read_after_write
+        self.retry_interval = retry_interval
+        self.reads = 0
+        self.failures = 0
+        self._next = 0
+        self._down_until: Dict[AsyncEngine, float] = {}
+        self._pins: Dict[int, float] = {}
+        for engine in engines:
+            event.listen(engine.sync_engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context) -> None:
+        # Connection level failures only, statement errors say nothing about health
+        if context.is_disconnect or context.connection is None:
+            for engine in self.engines:
+                if engine.sync_engine is context.engine:
+                    self.mark_down(engine)
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        self.failures += 1
+        self._down_until[engine] = time.monotonic() + self.retry_interval
+
+    def healthy(self) -> List[AsyncEngine]:
+        now = time.monotonic()
+        return [
+            engine for engine in self.engines if self._down_until.get(engine, 0) <= now
+        ]
+
+    def pick(self) -> Optional[AsyncEngine]:
+        '''
+        Next healthy replica (round-robin), None if there is none
+        '''
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[self._next]
+            self._next = (self._next + 1) % len(self.engines)
+            if self._down_until.get(engine, 0) <= now:
+                self.reads += 1
+                return engine
+        return None
+
+    def pin(self, user_id: Optional[int]) -> None:
+        '''
+        Keep the user's reads on the primary for `read_after_write` seconds
+        '''
+        if user_id is None or not self.engines or self.read_after_write <= 0:
+            return
+        now = time.monotonic()
+        if len(self._pins) > 10000:
+            self._pins = {key: until for key, until in self._pins.items() if until > now}
+        self._pins[user_id] = now + self.read_after_write
+
+    def is_pinned(self, user_id: Optional[int]) -> bool:
+        return user_id is not None and self._pins.get(user_id, 0) > time.monotonic()
+
+
+replica_set = ReplicaSet(
+    [create_engine(url) for url in DATABASE_REPLICA_URLS],
+    REPLICA_READ_AFTER_WRITE, REPLICA_RETRY_INTERVAL
 )
+
+
+class AppSession(Session):
+    '''
+    Sync session class behind the app's AsyncSessions
+    '''
+
+
+@event.listens_for(AppSession, 'after_begin')
+def propagate_deadline(session, transaction, connection):
+    """
+    Bound each transaction by the remaining request budget, so Postgres
+    cancels the query (and frees the connection) once the request is late
+    """
+    budget = remaining_budget()
+    if budget is None or connection.dialect.name != 'postgresql':
+        return
+    # Not one of the request's queries (budgets, Server-Timing)
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {max(int(budget * 1000), 1)}",
+        execution_options=UNCOUNTED
+    )
+
+
+class RoutingSession(AppSession):
+    '''
+    Session sending plain reads to replicas, everything else to the primary
+
+    Once a session writes (flush or DML statement) it stays on the primary
+    and the current user is pinned to it (see `ReplicaSet.pin`). Locking
+    reads (FOR UPDATE) and sessions marked with `use_primary` never go to
+    a replica.
+    '''
+    replicas = replica_set
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        replicas = self.replicas
+        if not self.info.get('primary'):
+            if self._flushing or (clause is not None and clause.is_dml):
+                self.info['primary'] = True
+                replicas.pin(current_user_id.get())
+            elif replicas.engines and clause is not None and clause.is_select \
+                    and getattr(clause, '_for_update_arg', None) is None \
+                    and not replicas.is_pinned(current_user_id.get()):
+                engine = replicas.pick()
+                if engine is not None:
+                    return engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def read_scope(self) -> Optional[str]:
+        '''
+        Where plain reads of the session go, so concurrent identical reads
+        of other sessions can share a query (`CRUDMixin.read_by_id`).
+        None once the session wrote or must read fresh data (`use_primary`).
+        '''
+        if self.info.get('primary'):
+            return None
+        if self.replicas.engines and not self.replicas.is_pinned(current_user_id.get()):
+            return 'replica'
+        return 'primary'
+
+
+def use_primary(db_session: AsyncSession) -> AsyncSession:
+    """
+    Route all statements of the session to the primary (reads that must be fresh)
+    """
+    db_session.info['primary'] = True
+    return db_session
+
+
 AsyncSessionFactory = async_sessionmaker(
     bind=async_engine,
+    sync_session_class=RoutingSession,
     **SESSION_PARAMS
 )
 
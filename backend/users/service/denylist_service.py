@@ -0,0 +1,229 @@
+import os
+import time
+import fcntl
+import heapq
+import struct
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.common.shared import SharedTable
+from backend.users.config import TOKEN_DENYLIST_PATH, TOKEN_DENYLIST_BLOOM_BITS, \
+    TOKEN_DENYLIST_BLOOM_HASHES
+from backend.users.service.token_service import open_shared_table
+
+# Persisted entry: jti key, expiry (unix time)
+ENTRY = struct.Struct('<qQ')
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+# splitmix64 constants, derive the Bloom filter's second hash from the key
+MIX_1 = 0xBF58476D1CE4E5B9
+MIX_2 = 0x94D049BB133111EB
+
+
+def jti_key(jti: str) -> int:
+    '''
+    Non-zero 64 bit key of a token id
+    '''
+    digest = hashlib.blake2b(jti.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True) or 1
+
+
+class BloomFilter:
+    '''
+    Bloom filter of 64 bit keys (double hashing)
+
+    No false negatives: a key it doesn't contain was never added, so most
+    lookups of never revoked tokens stop here. Keys can't be removed, the
+    filter is rebuilt from the live keys instead.
+    '''
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key: int):
+        first = key & MASK_64
+        second = ((first ^ (first >> 30)) * MIX_1) & MASK_64
+        second = (((second ^ (second >> 27)) * MIX_2) & MASK_64) | 1
+        for i in range(self.hashes):
+            yield ((first + i * second) & MASK_64) % self.bits
+
+    def add(self, key: int) -> None:
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(
+            self._array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def clear(self) -> None:
+        self._array = bytearray(len(self._array))
+
+
+class TokenDenylist:
+    '''
+    Expiring denylist of revoked token ids (`jti`)
+
+    Exact set of `jti` keys (64 bit digests) with their expiry, checked by
+    `auth_user` on every request without a database lookup. Entries are
+    pruned once their token has expired (heap ordered by `exp`).
+
+    In process, an optional Bloom filter answers most lookups of tokens that
+    were never revoked, and revocations are appended to `path` (16 bytes
+    each, compacted when pruned) so they survive a restart. Workers sharing
+    the file keep each other's entries: compaction (exclusive lock) merges
+    the live entries on disk, appends take a shared lock. With a shared
+    table (SHARED_STATE_DIR) the set lives in the memory-mapped state seen
+    by all workers, which persists it as well, expired slots get reused.
+
+    Attributes
+    ----------
+    path : Optional[str]
+        append-only persistence file (in-process set only)
+    bloom : Optional[BloomFilter]
+        filter in front of the in-process set
+    table : Optional[SharedTable]
+        expiring table shared by all workers, replaces the in-process set
+    rejected : int
+        number of requests rejected with a revoked token
+    '''
+
+    def __init__(
+        self, path: Optional[str] = None, bloom_bits: int = 0, bloom_hashes: int = 4,
+        table: Optional[SharedTable] = None
+    ):
+        self.path = path if table is None else None
+        self.table = table
+        self.bloom = BloomFilter(bloom_bits, bloom_hashes) \
+            if bloom_bits > 0 and table is None else None
+        self.rejected = 0
+        self._entries: Dict[int, int] = {}
+        self._expiries: List[Tuple[int, int]] = []
+        self._pruned = 0
+        if self.path and os.path.exists(self.path):
+            self._compact()
+
+    @contextmanager
+    def _file_lock(self, operation: int) -> Iterator[None]:
+        # Separate lock file, the data file is replaced by compaction.
+        # Record locks are per process, as the file is shared by workers
+        fd = os.open(f'{self.path}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self) -> Iterator[Tuple[int, int]]:
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A torn last entry (crash while appending) is ignored
+        usable = len(data) - len(data) % ENTRY.size
+        yield from ENTRY.iter_unpack(data[:usable])
+
+    def _add(self, key: int, expires_at: int) -> bool:
+        if expires_at <= self._entries.get(key, 0):
+            return False
+        self._entries[key] = expires_at
+        heapq.heappush(self._expiries, (expires_at, key))
+        if self.bloom is not None:
+            self.bloom.add(key)
+        return True
+
+    def _compact(self) -> None:
+        # Live entries only: rewrite the file & rebuild the Bloom filter
+        if self.path:
+            with self._file_lock(fcntl.LOCK_EX):
+                # Other workers' revocations on disk are kept (and known from now on)
+                now = time.time()
+                for key, expires_at in self._read():
+                    if expires_at > now:
+                        self._add(key, expires_at)
+                temp_path = f'{self.path}.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(b''.join(
+                        ENTRY.pack(key, expires_at)
+                        for key, expires_at in self._entries.items()
+                    ))
+                os.replace(temp_path, self.path)
+        if self.bloom is not None:
+            self.bloom.clear()
+            for key in self._entries:
+                self.bloom.add(key)
+        self._pruned = 0
+
+    def prune(self) -> int:
+        '''
+        Drop entries of expired tokens
+
+        :returns: number of dropped entries.
+        :rtype: int
+        '''
+        now = time.time()
+        pruned = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiries)
+            # Skip heap entries superseded by a later expiry of the same key
+            if self._entries.get(key) == expires_at:
+                del self._entries[key]
+                pruned += 1
+        self._pruned += pruned
+        # Amortized: compact once as many entries were dropped as are left
+        if self._pruned and self._pruned >= len(self._entries):
+            self._compact()
+        return pruned
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        '''
+        Deny a token until its expiry
+
+        :param jti: token id (`jti` claim).
+        :type jti: str
+        :param expires_at: token expiry (`exp` claim, unix time).
+        :type expires_at: float
+        '''
+        expires_at = int(expires_at) + 1
+        if expires_at <= time.time():
+            return
+        key = jti_key(jti)
+        if self.table is not None:
+            self.table.update(key, lambda current: max(current or 0, expires_at))
+            return
+        self.prune()
+        if self._add(key, expires_at) and self.path:
+            with self._file_lock(fcntl.LOCK_SH), open(self.path, 'ab') as f:
+                f.write(ENTRY.pack(key, expires_at))
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        '''
+        Check if a token id is denied (tokens without `jti` can't be revoked)
+        '''
+        if not jti:
+            return False
+        key = jti_key(jti)
+        if self.table is not None:
+            expires_at = self.table.get(key)
+        elif self._expiries and self._expiries[0][0] <= time.time():
+            self.prune()
+            expires_at = self._entries.get(key)
+        elif self.bloom is not None and key not in self.bloom:
+            return False
+        else:
+            expires_at = self._entries.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        # In-process entries (the shared table is only counted by a full scan)
+        return len(self._entries)
+
+
+token_denylist = TokenDenylist(
+    TOKEN_DENYLIST_PATH, TOKEN_DENYLIST_BLOOM_BITS, TOKEN_DENYLIST_BLOOM_HASHES,
+    open_shared_table('revoked_jti', expiring=True)
+)
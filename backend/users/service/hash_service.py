@@ -0,0 +1,167 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from backend.common.metrics import Histogram
+from backend.users.config import HASH_WORKERS, HASH_QUEUE_SIZE
+
+T = TypeVar('T')
+
+
+class HashQueueFullError(RuntimeError):
+    '''
+    Raised when the hashing executor can't accept any more jobs
+    '''
+
+
+class HashExecutor:
+    '''
+    Bounded executor for CPU-bound password hashing
+
+    bcrypt releases the GIL while hashing, so running it in a thread pool
+    keeps the event loop responsive and spreads the work across cores.
+    Jobs beyond `workers + queue_size` are rejected right away instead of
+    piling up behind the pool.
+
+    Attributes
+    ----------
+    workers : int
+        number of hashing threads
+    queue_size : int
+        max number of jobs waiting for a free thread
+    pending : int
+        jobs currently running or waiting
+    hashed : int
+        number of completed jobs
+    rejected : int
+        number of rejected jobs
+    total_time : float
+        cumulative hashing time (seconds)
+    max_time : float
+        slowest observed job (seconds)
+    latency : Histogram
+        hashing time distribution (seconds)
+    '''
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 0)
+        self.pending = 0
+        self.hashed = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.latency = Histogram(
+            'password_hash_seconds', 'Password hashing time',
+            buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+        )
+        self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        '''
+        Number of jobs waiting for a free thread
+        '''
+        return max(self.pending - self.workers, 0)
+
+    @property
+    def avg_time(self) -> float:
+        '''
+        Average hashing time (seconds)
+        '''
+        return self.total_time / self.hashed if self.hashed else 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='hash'
+            )
+        return self._executor
+
+    @staticmethod
+    def _timed(func: Callable[..., T], *args) -> tuple[T, float]:
+        start_time = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start_time
+
+    def _record(self, elapsed: float) -> None:
+        self.hashed += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.latency.observe(elapsed)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        '''
+        Run `func(*args)` in the hashing pool.
+
+        :param func: CPU-bound callable.
+        :type func: Callable
+        :raises HashQueueFullError: if the queue is full.
+        :returns: result of the callable.
+        '''
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HashQueueFullError("Password hashing queue is full")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(
+                self._get_executor(), self._timed, func, *args
+            )
+        finally:
+            self.pending -= 1
+        self._record(elapsed)
+        return result
+
+    async def map(self, func: Callable[..., T], items: list) -> list:
+        '''
+        Run `func(item)` for every item, `workers` jobs at a time.
+
+        Meant for bulk work (imports): never rejected, it waits for its own
+        jobs instead, but still shows up in the queue depth.
+
+        :param func: CPU-bound callable.
+        :type func: Callable
+        :param items: arguments, one per call.
+        :type items: list
+        :returns: results in the order of items.
+        '''
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        results = []
+        for start in range(0, len(items), self.workers):
+            chunk = items[start:start + self.workers]
+            self.pending += len(chunk)
+            try:
+                done = await asyncio.gather(*(
+                    loop.run_in_executor(executor, self._timed, func, item) for item in chunk
+                ))
+            finally:
+                self.pending -= len(chunk)
+            for result, elapsed in done:
+                self._record(elapsed)
+                results.append(result)
+        return results
+
+    def stats(self) -> dict:
+        '''
+        Snapshot of executor counters
+        '''
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'queue_depth': self.queue_depth,
+            'hashed': self.hashed,
+            'rejected': self.rejected,
+            'avg_time': self.avg_time,
+            'max_time': self.max_time,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hash_executor = HashExecutor(HASH_WORKERS, HASH_QUEUE_SIZE)
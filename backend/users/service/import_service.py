@@ -0,0 +1,163 @@
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.users.model import User
+from backend.users.schema import UserImportSchema, UserImportIssue, UserImportReport
+from backend.users.service.hash_service import hash_executor
+from backend.users.util.auth_util import hash_password
+
+ImportRow = Tuple[int, Optional[UserImportSchema], Optional[str]]
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a streamed request body into lines without buffering it whole
+    """
+    buffer = b''
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def parse_rows(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ImportRow]:
+    """
+    Parse JSON Lines ('jsonl') or CSV ('csv', header required) import rows.
+
+    Yields (line number, row, None) for valid rows and
+    (line number, None, error) for invalid ones, empty lines are skipped.
+    CSV records may span lines (quoted newlines), their first line is reported.
+    """
+    header = None
+    line_no = 0
+    # CSV record so far & its first line, open while it has an odd number of quotes
+    record = None
+    record_line_no = 0
+    async for raw_line in iter_lines(stream):
+        line_no += 1
+        try:
+            line = raw_line.decode('utf-8')
+        except UnicodeDecodeError:
+            yield line_no, None, "Line is not valid UTF-8"
+            record = None
+            continue
+        if fmt == 'csv' and record is not None:
+            # Inside a quoted field: the line break belongs to the value
+            record += '\n' + line.rstrip('\r')
+            if record.count('"') % 2:
+                continue
+            line, record = record, None
+        else:
+            line = line.strip()
+            if not line:
+                continue
+            record_line_no = line_no
+            if fmt == 'csv' and line.count('"') % 2:
+                record = line
+                continue
+        try:
+            if fmt == 'csv':
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [value.strip() for value in values]
+                    continue
+                data = dict(zip(header, values))
+            else:
+                data = json.loads(line)
+            yield record_line_no, UserImportSchema.model_validate(data), None
+        except (ValueError, ValidationError, csv.Error) as e:
+            yield record_line_no, None, str(e)
+    if record is not None:
+        yield record_line_no, None, "Unterminated quoted field"
+
+
+async def _insert_batch(
+    db_session: AsyncSession, batch: List[Tuple[int, UserImportSchema]],
+    report: UserImportReport
+) -> None:
+    unique_rows = []
+    usernames = set()
+    for line_no, row in batch:
+        if row.username in usernames:
+            report.conflicts.append(UserImportIssue(
+                line=line_no, username=row.username, detail="Duplicate username in upload"
+            ))
+            continue
+        usernames.add(row.username)
+        unique_rows.append((line_no, row))
+
+    hashed_passwords = await hash_executor.map(
+        hash_password, [row.password for _, row in unique_rows]
+    )
+    values = [
+        {'username': row.username, 'password': hashed_password, 'is_admin': row.is_admin}
+        for (_, row), hashed_password in zip(unique_rows, hashed_passwords)
+    ]
+
+    connection = await db_session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == 'postgresql' \
+        else sqlite.insert
+    table = User.__table__
+    stmt = dialect_insert(table).on_conflict_do_nothing(
+        index_elements=[table.c.username]
+    ).returning(table.c.username)
+    try:
+        created = set((await db_session.execute(stmt, values)).scalars().all())
+        await db_session.commit()
+    except SQLAlchemyError as e:
+        await db_session.rollback()
+        report.errors.extend(
+            UserImportIssue(line=line_no, username=row.username, detail=str(e.__cause__ or e))
+            for line_no, row in unique_rows
+        )
+        return
+
+    report.created += len(created)
+    report.conflicts.extend(
+        UserImportIssue(line=line_no, username=row.username, detail="Username already exists")
+        for line_no, row in unique_rows if row.username not in created
+    )
+
+
+async def import_users(
+    db_session: AsyncSession, rows: AsyncIterator[ImportRow], batch_size: int
+) -> UserImportReport:
+    """
+    Bulk insert users in batches.
+
+    Passwords of a batch are hashed in parallel in the hashing executor,
+    then the batch goes in as one multi-row INSERT ... ON CONFLICT DO NOTHING
+    (executemany), usernames that already exist are reported as conflicts
+    and don't abort the batch.
+
+    :param db_session: database session.
+    :type db_session: AsyncSession
+    :param rows: parsed import rows (see `parse_rows`).
+    :type rows: AsyncIterator
+    :param batch_size: rows per INSERT batch.
+    :type batch_size: int
+    :returns: import report.
+    :rtype: UserImportReport
+    """
+    report = UserImportReport()
+    batch = []
+    async for line_no, row, error in rows:
+        if error is not None:
+            report.errors.append(UserImportIssue(line=line_no, detail=error))
+            continue
+        batch.append((line_no, row))
+        if len(batch) >= batch_size:
+            await _insert_batch(db_session, batch, report)
+            batch = []
+    if batch:
+        await _insert_batch(db_session, batch, report)
+    return report
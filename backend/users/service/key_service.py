@@ -0,0 +1,235 @@
+import json
+import os
+import hmac
+import base64
+import asyncio
+import hashlib
+import logging
+from calendar import timegm
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+
+SYMMETRIC_ALGORITHMS = {'HS256', 'HS384', 'HS512'}
+HMAC_DIGESTS = {'HS256': hashlib.sha256, 'HS384': hashlib.sha384, 'HS512': hashlib.sha512}
+# NumericDate claims, datetimes are encoded as integer unix time (as python-jose does)
+TIME_CLAIMS = ('exp', 'iat', 'nbf')
+# Same output as python-jose's `json.dumps(claims, separators=(",", ":"))`,
+# built once instead of per call
+CLAIMS_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+logger = logging.getLogger(__name__)
+
+
+def base64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).replace(b'=', b'')
+
+
+class KeyRing:
+    '''
+    JWT signing/verification keys
+
+    HS* algorithms sign with the shared `secret`. For RS*/ES* algorithms
+    keys are loaded from `keys_dir`: every `<kid>.pem` file is a key, private
+    keys can sign & verify, public ones only verify (retired keys). Tokens
+    are signed with `active_kid` (the last kid in sorted order by default)
+    and verified with the key named by their `kid` header, so keys can be
+    rotated without downtime: publish the new key first, switch the active
+    kid, drop the old one once its tokens expire. With `reload_interval`
+    set, a background task picks up added/removed key files without a
+    restart (`JWT_ACTIVE_KID` is read at startup only).
+
+    Parsed key objects and the public JWKS document are cached in process.
+    Signing skips python-jose's generic path: the header segment is encoded
+    once per active key and HS* tokens are signed with a prepared HMAC
+    state, the output is byte-for-byte what `jwt.encode` produces.
+
+    Attributes
+    ----------
+    signed : int
+        number of signed tokens
+    decoded : int
+        number of verified tokens
+    rejected : int
+        number of tokens that failed verification
+    '''
+
+    def __init__(
+        self, algorithm: str, secret: Optional[str] = None,
+        keys_dir: Optional[str] = None, active_kid: Optional[str] = None,
+        reload_interval: float = 0
+    ):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.keys_dir = keys_dir
+        self.configured_kid = active_kid
+        self.active_kid = active_kid
+        self.reload_interval = reload_interval
+        self._files: Tuple = ()
+        self._task: Optional[asyncio.Task] = None
+        self._keys: Dict[str, Key] = {}
+        self._public_keys: Dict[str, Key] = {}
+        self._header_segment = b''
+        self._hmac = None
+        self._jwks = b'{"keys":[]}'
+        self.etag = ''
+        self.signed = 0
+        self.decoded = 0
+        self.rejected = 0
+        self.reload()
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm in SYMMETRIC_ALGORITHMS
+
+    def key_files(self) -> Tuple:
+        '''
+        Names, sizes & mtimes of the `<kid>.pem` files in `keys_dir`
+        '''
+        files = []
+        with os.scandir(self.keys_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pem'):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(files))
+
+    def reload(self) -> None:
+        '''
+        (Re)load keys from `keys_dir` and rebuild the JWKS document
+        '''
+        keys = {}
+        if self.symmetric:
+            if not self.secret:
+                raise RuntimeError(f"SECRET_KEY is required for {self.algorithm}")
+        else:
+            if not self.keys_dir or not os.path.isdir(self.keys_dir):
+                raise RuntimeError(f"JWT_KEYS_DIR is required for {self.algorithm}")
+            files = self.key_files()
+            for file_name, _, _ in files:
+                with open(os.path.join(self.keys_dir, file_name), 'rb') as file:
+                    keys[os.path.splitext(file_name)[0]] = jwk.construct(
+                        file.read(), self.algorithm
+                    )
+            signing_kids = [kid for kid, key in keys.items() if not key.is_public()]
+            if not signing_kids:
+                raise RuntimeError(f"No private key found in {self.keys_dir}")
+            if self.configured_kid and self.configured_kid not in signing_kids:
+                raise RuntimeError(f"No private key for kid {self.configured_kid}")
+            self.active_kid = self.configured_kid or signing_kids[-1]
+            self._files = files
+
+        self._keys = keys
+        self._public_keys = {kid: key.public_key() for kid, key in keys.items()}
+        jwks = {'keys': [
+            {**key.to_dict(), 'kid': kid, 'use': 'sig'}
+            for kid, key in self._public_keys.items()
+        ]}
+        self._jwks = json.dumps(jwks, separators=(',', ':'), sort_keys=True).encode()
+        self.etag = '"' + hashlib.sha256(self._jwks).hexdigest()[:32] + '"'
+
+        header = {'alg': self.algorithm, 'typ': 'JWT'}
+        if self.symmetric:
+            self._hmac = hmac.new(
+                self.secret.encode('utf-8'), digestmod=HMAC_DIGESTS[self.algorithm]
+            )
+        else:
+            header['kid'] = self.active_kid
+        self._header_segment = base64url_encode(
+            json.dumps(header, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        )
+
+    def sign(self, claims: dict) -> str:
+        '''
+        Encode and sign claims with the active key
+
+        :param claims: token claims.
+        :type claims: dict
+        :returns: encoded JWT token.
+        :rtype: str
+        '''
+        self.signed += 1
+        if any(isinstance(claims.get(claim), datetime) for claim in TIME_CLAIMS):
+            claims = {
+                name: timegm(value.utctimetuple())
+                if name in TIME_CLAIMS and isinstance(value, datetime) else value
+                for name, value in claims.items()
+            }
+        signing_input = self._header_segment + b'.' + base64url_encode(
+            CLAIMS_ENCODER.encode(claims).encode('utf-8')
+        )
+        if self.symmetric:
+            signer = self._hmac.copy()
+            signer.update(signing_input)
+            signature = signer.digest()
+        else:
+            signature = self._keys[self.active_kid].sign(signing_input)
+        return (signing_input + b'.' + base64url_encode(signature)).decode('utf-8')
+
+    def decode(self, token: str) -> dict:
+        '''
+        Verify and decode a token
+
+        :param token: encoded JWT token.
+        :type token: str
+        :raises JWTError: if the token is invalid, expired or has an unknown kid.
+        :returns: token claims.
+        :rtype: dict
+        '''
+        try:
+            if self.symmetric:
+                payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            else:
+                key = self._public_keys.get(jwt.get_unverified_header(token).get('kid'))
+                if key is None:
+                    raise JWTError("Unknown signing key")
+                payload = jwt.decode(token, key, algorithms=[self.algorithm])
+        except JWTError:
+            self.rejected += 1
+            raise
+        self.decoded += 1
+        return payload
+
+    def jwks(self) -> bytes:
+        '''
+        Public keys as a pre-rendered JWKS document
+        '''
+        return self._jwks
+
+    def reload_if_changed(self) -> bool:
+        '''
+        Reload keys if a key file was added, removed or rewritten
+
+        :returns: whether keys were reloaded.
+        :rtype: bool
+        '''
+        if self.symmetric or self.key_files() == self._files:
+            return False
+        self.reload()
+        logger.info("Reloaded JWT keys, active kid %s", self.active_kid)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                # On the event loop: sign/decode never see a half-swapped ring
+                self.reload_if_changed()
+            except Exception:  # pylint: disable=W0718
+                # Half-written or invalid key files, previous keys stay in use
+                logger.exception("JWT keys reload failed")
+
+    def start(self) -> None:
+        if self._task is None and self.reload_interval > 0 and not self.symmetric:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
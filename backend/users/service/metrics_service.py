@@ -0,0 +1,115 @@
+from backend.common.metrics import Registry
+from backend.common.model.mixin import CRUDMixin
+from backend.users.service.db_service import async_engine, pool_wait, pool_checkouts, \
+    replica_set
+from backend.users.service.denylist_service import token_denylist
+from backend.users.service.hash_service import hash_executor
+from backend.users.service.refresh_token_service import refresh_token_sweeper
+from backend.users.service.throttle_service import login_throttle
+from backend.users.service.token_service import token_cache
+from backend.users.util import key_ring
+
+registry = Registry()
+
+# Request metrics, recorded by MetricsMiddleware
+request_latency = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route template, method & status',
+    labelnames=('route', 'method', 'status')
+)
+requests_in_flight = registry.gauge('http_requests_in_flight', 'Requests being processed')
+
+
+def _pool_stat(name: str):
+    # Queue pools only (NullPool has nothing to report)
+    def read():
+        method = getattr(async_engine.pool, name, None)
+        return method() if method is not None else None
+    return read
+
+
+# Database pool
+registry.register(pool_wait)
+registry.register(pool_checkouts)
+registry.callback('db_pool_size', 'Configured pool size', _pool_stat('size'))
+registry.callback('db_pool_checked_out', 'Connections in use', _pool_stat('checkedout'))
+registry.callback(
+    'db_pool_overflow', 'Connections open beyond the pool size', _pool_stat('overflow')
+)
+registry.callback(
+    'db_replicas_healthy', 'Read replicas currently in rotation',
+    lambda: len(replica_set.healthy()) if replica_set.engines else None
+)
+registry.callback(
+    'db_replica_reads', 'Reads routed to a replica', lambda: replica_set.reads, type='counter'
+)
+registry.callback(
+    'db_replica_failures', 'Replicas marked down after a connection failure',
+    lambda: replica_set.failures, type='counter'
+)
+registry.callback(
+    'db_reads_coalesced', 'Reads by id served by another request\'s in-flight query',
+    lambda: CRUDMixin.read_flights.coalesced, type='counter'
+)
+
+# Password hashing
+registry.register(hash_executor.latency)
+registry.callback(
+    'password_hash_queue_depth', 'Hashing jobs waiting for a thread',
+    lambda: hash_executor.queue_depth
+)
+registry.callback(
+    'password_hash_rejected', 'Hashing jobs rejected (queue full)',
+    lambda: hash_executor.rejected, type='counter'
+)
+
+# JWT
+registry.callback(
+    'jwt_operations', 'JWT encode & decode operations',
+    lambda: {
+        'encode': key_ring.signed,
+        'decode': key_ring.decoded,
+        'decode_failed': key_ring.rejected,
+    },
+    type='counter', label='operation'
+)
+registry.callback(
+    'jwt_cache_lookups', 'Verified token cache lookups',
+    lambda: {'hit': token_cache.hits, 'miss': token_cache.misses},
+    type='counter', label='result'
+)
+registry.callback('jwt_cache_size', 'Cached token payloads', lambda: token_cache.stats()['size'])
+registry.callback(
+    'jwt_denylist_size', 'Revoked access tokens not expired yet (in-process denylist)',
+    lambda: len(token_denylist) if token_denylist.table is None else None
+)
+registry.callback(
+    'jwt_denylist_rejected', 'Requests rejected with a revoked access token',
+    lambda: token_denylist.rejected, type='counter'
+)
+
+registry.callback(
+    'login_throttled', 'Login attempts rejected by throttling',
+    lambda: login_throttle.throttled, type='counter'
+)
+
+# Refresh token sweeper
+registry.callback(
+    'refresh_token_sweeps', 'Completed expired token sweeps',
+    lambda: refresh_token_sweeper.sweeps, type='counter'
+)
+registry.callback(
+    'refresh_token_removed', 'Expired refresh tokens removed',
+    lambda: refresh_token_sweeper.removed, type='counter'
+)
+registry.callback(
+    'refresh_token_sweep_duration_seconds', 'Time spent sweeping expired refresh tokens',
+    lambda: refresh_token_sweeper.total_duration, type='counter'
+)
+registry.callback(
+    'refresh_token_sweep_last_duration_seconds', 'Duration of the last refresh token sweep',
+    lambda: refresh_token_sweeper.last_duration
+)
+registry.callback(
+    'refresh_token_evicted', 'Refresh tokens evicted by the per-user session cap',
+    lambda: refresh_token_sweeper.evicted, type='counter'
+)
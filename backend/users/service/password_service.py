@@ -0,0 +1,228 @@
+import time
+import zlib
+import logging
+from typing import Optional
+
+import bcrypt
+
+from backend.common.shared import SharedTable
+from backend.users.config import PASSWORD_HASH_ALGORITHM, BCRYPT_ROUNDS, ARGON2_TIME_COST, \
+    ARGON2_MEMORY_COST, ARGON2_PARALLELISM, PASSWORD_HASH_TARGET_TIME, \
+    PASSWORD_HASH_ALLOW_LOWER_COST
+from backend.users.service.token_service import open_shared_table
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+ARGON2_PREFIX = '$argon2id$'
+# Bounds of the calibrated bcrypt cost (4 is bcrypt's minimum, 10 is the OWASP floor)
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MAX_TIME_COST = 10
+
+
+def _load_argon2():
+    try:
+        from argon2 import PasswordHasher, extract_parameters  # pylint: disable=C0415
+        from argon2.exceptions import VerificationError, InvalidHashError  # pylint: disable=C0415
+    except ImportError as e:
+        raise RuntimeError("argon2id hashing requires the `argon2-cffi` package") from e
+    return PasswordHasher, extract_parameters, (VerificationError, InvalidHashError)
+
+
+class PasswordPolicy:
+    '''
+    Current password hashing policy
+
+    Hashes new passwords with the configured algorithm & cost, verifies
+    hashes of any supported scheme (bcrypt, argon2id) and tells which
+    stored hashes are weaker than the policy, so they can be replaced on
+    the next successful login without a password reset. Stronger hashes
+    are kept, so hosts or workers with different costs don't make hashes
+    bounce between them.
+
+    Parameters
+    ----------
+    algorithm: str
+        'bcrypt' or 'argon2id' (needs `argon2-cffi`).
+    bcrypt_rounds: int
+        bcrypt cost (log2 of the number of rounds).
+    argon2_time_cost: int
+        argon2id iterations.
+    argon2_memory_cost: int
+        argon2id memory (KiB).
+    argon2_parallelism: int
+        argon2id lanes.
+    '''
+
+    def __init__(
+        self, algorithm: str, bcrypt_rounds: int, argon2_time_cost: int,
+        argon2_memory_cost: int, argon2_parallelism: int
+    ):
+        if algorithm not in ('bcrypt', 'argon2id'):
+            raise RuntimeError(f"Unsupported password hash algorithm {algorithm}")
+        self.algorithm = algorithm
+        self.bcrypt_rounds = bcrypt_rounds
+        self.argon2_time_cost = argon2_time_cost
+        self.argon2_memory_cost = argon2_memory_cost
+        self.argon2_parallelism = argon2_parallelism
+        self._argon2 = None
+        if algorithm == 'argon2id':
+            self._configure_argon2()
+
+    def _configure_argon2(self) -> None:
+        password_hasher, self._argon2_parameters, self._argon2_errors = _load_argon2()
+        self._argon2 = password_hasher(
+            time_cost=self.argon2_time_cost, memory_cost=self.argon2_memory_cost,
+            parallelism=self.argon2_parallelism
+        )
+
+    def _argon2_hasher(self):
+        if self._argon2 is None:
+            # Verifying legacy argon2 hashes under a bcrypt policy
+            self._configure_argon2()
+        return self._argon2
+
+    def hash(self, password: str) -> str:
+        '''
+        Hash a password with the current policy (blocking)
+        '''
+        if self.algorithm == 'argon2id':
+            return self._argon2.hash(password)
+        salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        '''
+        Check a password against a hash of any supported scheme (blocking)
+        '''
+        if hashed_password.startswith(ARGON2_PREFIX):
+            try:
+                return self._argon2_hasher().verify(hashed_password, password)
+            except self._argon2_errors:
+                return False
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        '''
+        Check if a stored hash uses another algorithm or a lower cost
+        '''
+        if self.algorithm == 'argon2id':
+            if not hashed_password.startswith(ARGON2_PREFIX):
+                return True
+            try:
+                parameters = self._argon2_parameters(hashed_password)
+            except self._argon2_errors:
+                return True
+            return parameters.time_cost < self.argon2_time_cost \
+                or parameters.memory_cost < self.argon2_memory_cost
+        if not hashed_password.startswith(BCRYPT_PREFIXES):
+            return True
+        return (bcrypt_rounds(hashed_password) or 0) < self.bcrypt_rounds
+
+    def calibrate(
+        self, target_time: float, allow_lower: bool = False,
+        shared: Optional[SharedTable] = None
+    ) -> int:
+        '''
+        Pick the highest cost whose hashing time stays within `target_time`.
+
+        bcrypt time doubles with every extra round and argon2id time grows
+        linearly with its iterations, so one timed hash at the lowest cost
+        is enough to extrapolate (blocking, run it off the event loop).
+
+        With a `shared` table, the first process to calibrate stores the
+        cost and every other one (gunicorn workers) reuses it instead of
+        timing hashes concurrently on the same cores.
+
+        :param target_time: target hashing time (seconds).
+        :type target_time: float
+        :param allow_lower: allow a cost below the configured one.
+        :type allow_lower: bool
+        :param shared: calibrated costs shared by all workers.
+        :type shared: Optional[SharedTable]
+        :returns: the cost in use (bcrypt rounds or argon2id iterations).
+        :rtype: int
+        '''
+        argon2 = self.algorithm == 'argon2id'
+        configured = self.argon2_time_cost if argon2 else self.bcrypt_rounds
+        floor = 1 if argon2 else BCRYPT_MIN_ROUNDS
+        if not allow_lower:
+            floor = max(floor, configured)
+        measure = self._measure_argon2_cost if argon2 else self._measure_bcrypt_cost
+        if shared is None:
+            cost = measure(target_time, floor)
+        else:
+            # Same settings, same key: a config change gets calibrated again
+            key = zlib.crc32(f'{self.algorithm}:{target_time}:{floor}'.encode()) or 1
+            cost = shared.update(
+                key, lambda stored: stored if stored is not None else measure(target_time, floor)
+            )
+        if argon2:
+            self.argon2_time_cost = cost
+            self._configure_argon2()
+        else:
+            self.bcrypt_rounds = cost
+        logger.warning("Password hash cost %s %d", self.algorithm, cost)
+        return cost
+
+    def _measure_argon2_cost(self, target_time: float, floor: int) -> int:
+        password_hasher, _, _ = _load_argon2()
+        start_time = time.perf_counter()
+        password_hasher(
+            time_cost=1, memory_cost=self.argon2_memory_cost,
+            parallelism=self.argon2_parallelism
+        ).hash('calibration')
+        elapsed = time.perf_counter() - start_time
+        cost = max(floor, min(int(target_time / elapsed), ARGON2_MAX_TIME_COST))
+        logger.warning(
+            "Calibrated argon2id time cost %d (%.1f ms per iteration)", cost, elapsed * 1000
+        )
+        return cost
+
+    @staticmethod
+    def _measure_bcrypt_cost(target_time: float, floor: int) -> int:
+        salt = bcrypt.gensalt(rounds=BCRYPT_MIN_ROUNDS)
+        start_time = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        elapsed = time.perf_counter() - start_time
+        rounds = BCRYPT_MIN_ROUNDS
+        while rounds < BCRYPT_MAX_ROUNDS and elapsed * 2 <= target_time:
+            rounds += 1
+            elapsed *= 2
+        rounds = max(rounds, floor)
+        logger.warning("Calibrated bcrypt cost %d (~%.1f ms per hash)", rounds, elapsed * 1000)
+        return rounds
+
+
+def bcrypt_rounds(hashed_password: str) -> Optional[int]:
+    '''
+    Cost of a bcrypt hash (`$2b$<cost>$...`)
+    '''
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+password_policy = PasswordPolicy(
+    PASSWORD_HASH_ALGORITHM, BCRYPT_ROUNDS, ARGON2_TIME_COST, ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM
+)
+
+
+def calibrate_password_policy() -> None:
+    '''
+    Calibrate the password cost once for all workers (PASSWORD_HASH_TARGET_TIME).
+
+    Run by the gunicorn master before forking and by the app lifespan, which
+    reuses the stored cost (SHARED_STATE_DIR) or calibrates a single process.
+    '''
+    if PASSWORD_HASH_TARGET_TIME <= 0:
+        return
+    shared = open_shared_table('password_cost', slots=64)
+    try:
+        password_policy.calibrate(PASSWORD_HASH_TARGET_TIME, PASSWORD_HASH_ALLOW_LOWER_COST, shared)
+    finally:
+        if shared is not None:
+            shared.close()
@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.users.config import REFRESH_TOKEN_SWEEP_INTERVAL, REFRESH_TOKEN_SWEEP_BATCH, \
+    REFRESH_TOKEN_MAX_PER_USER
+from backend.users.model import RefreshToken
+from backend.users.service.db_service import AsyncSessionFactory
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenSweeper:
+    '''
+    Periodic removal of expired refresh tokens & per-user session cap
+
+    Deletes in batches of `batch_size` rows (one short transaction each),
+    so a large backlog never locks the table for long.
+
+    Attributes
+    ----------
+    sweeps : int
+        number of completed sweeps
+    removed : int
+        total number of removed tokens
+    last_removed : int
+        tokens removed by the last sweep
+    last_duration : float
+        duration of the last sweep (seconds)
+    total_duration : float
+        cumulative sweep time (seconds)
+    evicted : int
+        tokens evicted by the per-user session cap
+    '''
+
+    def __init__(
+        self, session_factory: async_sessionmaker, interval: float, batch_size: int,
+        max_per_user: int
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = max(batch_size, 1)
+        self.max_per_user = max_per_user
+        self.sweeps = 0
+        self.removed = 0
+        self.last_removed = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def enforce_cap(self, db_session: AsyncSession, user_id: int) -> int:
+        '''
+        Evict the oldest refresh tokens of the user beyond `max_per_user`
+
+        :param db_session: database session.
+        :type db_session: AsyncSession
+        :param user_id: user's id.
+        :type user_id: int
+        :returns: number of evicted tokens.
+        :rtype: int
+        '''
+        if self.max_per_user <= 0:
+            return 0
+        stale_ids = select(RefreshToken.id).where(
+            RefreshToken.user_id == user_id
+        ).order_by(RefreshToken.id.desc()).offset(self.max_per_user)
+        result = await db_session.execute(
+            delete(RefreshToken).where(RefreshToken.id.in_(stale_ids))
+        )
+        await db_session.commit()
+        self.evicted += result.rowcount
+        return result.rowcount
+
+    async def sweep(self) -> int:
+        '''
+        Delete all expired tokens, batch by batch
+
+        :returns: number of removed tokens.
+        :rtype: int
+        '''
+        start_time = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        removed = 0
+        while True:
+            expired_ids = select(RefreshToken.id).where(
+                RefreshToken.expires_at < now
+            ).limit(self.batch_size)
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    delete(RefreshToken).where(RefreshToken.id.in_(expired_ids))
+                )
+                await session.commit()
+            removed += result.rowcount
+            if result.rowcount < self.batch_size:
+                break
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+
+        elapsed = time.perf_counter() - start_time
+        self.sweeps += 1
+        self.removed += removed
+        self.last_removed = removed
+        self.last_duration = elapsed
+        self.total_duration += elapsed
+        return removed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:  # pylint: disable=W0718
+                logger.exception("Refresh token sweep failed")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        '''
+        Snapshot of sweeper counters
+        '''
+        return {
+            'sweeps': self.sweeps,
+            'removed': self.removed,
+            'last_removed': self.last_removed,
+            'last_duration': self.last_duration,
+            'total_duration': self.total_duration,
+            'evicted': self.evicted,
+        }
+
+
+refresh_token_sweeper = RefreshTokenSweeper(
+    AsyncSessionFactory, REFRESH_TOKEN_SWEEP_INTERVAL, REFRESH_TOKEN_SWEEP_BATCH,
+    REFRESH_TOKEN_MAX_PER_USER
+)
@@ -0,0 +1,176 @@
+import time
+import math
+from collections import OrderedDict
+from typing import Optional, Protocol, Tuple
+
+from backend.users.config import LOGIN_THROTTLE_WINDOW, LOGIN_THROTTLE_USER_LIMIT, \
+    LOGIN_THROTTLE_IP_LIMIT, LOGIN_THROTTLE_URL
+
+
+def _weighted_count(previous: int, current: int, elapsed: float, window: float) -> float:
+    # Sliding window approximation: the previous window counts in proportion
+    # to how much of it still overlaps the last `window` seconds
+    return previous * (1 - elapsed / window) + current
+
+
+def _retry_after(previous: int, current: int, elapsed: float, limit: int, window: float) -> float:
+    '''
+    Seconds until one more attempt fits into the sliding window
+    '''
+    # Attempts of the current window alone are over the limit: wait for the next one,
+    # otherwise wait until enough of the previous window slides out
+    if current + 1 > limit or not previous:
+        return window - elapsed
+    needed = (previous + current + 1 - limit) / previous
+    return max(needed * window - elapsed, 0.0) or 1.0
+
+
+class ThrottleBackend(Protocol):
+    '''
+    Storage of per-key attempt counters
+    '''
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        '''
+        Record an attempt unless the key is over `limit` attempts per `window`.
+
+        :returns: seconds to wait if throttled, None if the attempt is allowed.
+        '''
+
+
+class MemoryThrottleBackend:
+    '''
+    In-process sliding window counters
+
+    Keeps two fixed-window counters per key (previous & current), so memory
+    stays O(keys) however many attempts come in. Keys are kept in order of
+    their last attempt and the least recently attempted ones are evicted
+    once the table grows past `max_keys` (O(1) per attempt, even when many
+    keys are sprayed within one window).
+
+    Note: counters are per worker, use a shared backend with several workers.
+    '''
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._counters: OrderedDict[str, Tuple[int, int, int]] = OrderedDict()
+
+    def _store(self, key: str, counters: Tuple[int, int, int]) -> None:
+        self._counters[key] = counters
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        now = time.time()
+        window_index = int(now // window)
+        index, previous, current = self._counters.get(key, (window_index, 0, 0))
+        if index != window_index:
+            previous = current if index == window_index - 1 else 0
+            current = 0
+        elapsed = now - window_index * window
+        if _weighted_count(previous, current, elapsed, window) + 1 > limit:
+            self._store(key, (window_index, previous, current))
+            return _retry_after(previous, current, elapsed, limit, window)
+
+        self._store(key, (window_index, previous, current + 1))
+        return None
+
+
+class SharedThrottleBackend:
+    '''
+    Sliding window counters in a shared key-value store (e.g. Redis)
+
+    Works with any async client exposing `get`, `incr`, `decr` and `expire`
+    (`redis.asyncio.Redis` does), so all workers see the same counters.
+    One counter key per key & window, each expiring after two windows.
+    The attempt is counted first and decided on the atomic `incr` result,
+    so concurrent workers can't all pass the check, a rejected attempt is
+    taken back with `decr`.
+    '''
+
+    def __init__(self, client, prefix: str = 'throttle'):
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        now = time.time()
+        window_index = int(now // window)
+        elapsed = now - window_index * window
+        previous = int(await self.client.get(f'{self.prefix}:{key}:{window_index - 1}') or 0)
+        current_key = f'{self.prefix}:{key}:{window_index}'
+        attempts = await self.client.incr(current_key)
+        if attempts == 1:
+            await self.client.expire(current_key, math.ceil(window * 2))
+        # Attempts before this one
+        current = attempts - 1
+        if _weighted_count(previous, current, elapsed, window) + 1 > limit:
+            await self.client.decr(current_key)
+            return _retry_after(previous, current, elapsed, limit, window)
+        return None
+
+
+class LoginThrottle:
+    '''
+    Login attempt limits per username and per client IP
+
+    Checked before any credential work, so throttled attempts never reach
+    the user lookup or bcrypt. An attempt rejected by a limit isn't counted
+    against it, so a client gets through again as soon as the window slides.
+
+    Parameters
+    ----------
+    backend: ThrottleBackend
+        counter storage.
+    window: float
+        sliding window length (seconds).
+    user_limit: int
+        attempts per username per window (0 - unlimited).
+    ip_limit: int
+        attempts per client IP per window (0 - unlimited).
+    '''
+
+    def __init__(self, backend: ThrottleBackend, window: float, user_limit: int, ip_limit: int):
+        self.backend = backend
+        self.window = window
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.throttled = 0
+
+    async def check(self, username: str, client_ip: Optional[str]) -> Optional[int]:
+        '''
+        Record a login attempt
+
+        :returns: Retry-After seconds if the attempt is throttled, None otherwise.
+        :rtype: Optional[int]
+        '''
+        checks = []
+        if self.ip_limit > 0 and client_ip:
+            checks.append((f'ip:{client_ip}', self.ip_limit))
+        if self.user_limit > 0:
+            checks.append((f'user:{username.lower()}', self.user_limit))
+        for key, limit in checks:
+            retry_after = await self.backend.hit(key, limit, self.window)
+            if retry_after is not None:
+                self.throttled += 1
+                return max(math.ceil(retry_after), 1)
+        return None
+
+
+def create_backend(url: Optional[str]) -> ThrottleBackend:
+    '''
+    Shared backend for a `redis://` url, in-process counters otherwise
+    '''
+    if not url:
+        return MemoryThrottleBackend()
+    try:
+        from redis import asyncio as redis  # pylint: disable=C0415
+    except ImportError as e:
+        raise RuntimeError("LOGIN_THROTTLE_URL requires the `redis` package") from e
+    return SharedThrottleBackend(redis.from_url(url))
+
+
+login_throttle = LoginThrottle(
+    create_backend(LOGIN_THROTTLE_URL), LOGIN_THROTTLE_WINDOW,
+    LOGIN_THROTTLE_USER_LIMIT, LOGIN_THROTTLE_IP_LIMIT
+)
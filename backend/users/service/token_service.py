@@ -0,0 +1,209 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from jose import jwt, JWTError
+
+from backend.common.shared import SharedTable
+from backend.users.config import TOKEN_CACHE_SIZE, SHARED_STATE_DIR, SHARED_STATE_SLOTS
+
+
+def open_shared_table(
+    name: str, expiring: bool = False, slots: Optional[int] = None
+) -> Optional[SharedTable]:
+    '''
+    Table `name` of the state shared by all workers, None without SHARED_STATE_DIR
+    '''
+    if not SHARED_STATE_DIR:
+        return None
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    return SharedTable(
+        os.path.join(SHARED_STATE_DIR, name), slots or SHARED_STATE_SLOTS, expiring
+    )
+
+
+# Longest token lifetime (refresh tokens, 7 days) plus clock leeway: older
+# versions can't be referenced by any valid token anymore
+TOKEN_MAX_LIFETIME = 7 * 24 * 3600 + 60
+
+
+class UserVersionTable:
+    '''
+    Table of user token versions
+
+    Every token carries the version of its user at issue time (`ver` claim).
+    Bumping the version on username/permission changes or deletion makes
+    previously issued tokens stale without a database lookup.
+
+    A version is the time its entry expires (bump time + `lifetime`, always
+    above the previous one): once it has passed, every token issued before
+    the bump has expired as well, so the entry is dropped and its slot is
+    reused (expiring shared table). Tokens issued after the bump carry that
+    version or a higher one and stay valid.
+
+    Note: without a shared table the versions live in process memory, so
+    they're per worker and reset on restart.
+
+    Parameters
+    ----------
+    table: Optional[SharedTable]
+        versions shared by all workers (expiring), in-process dict if None.
+    lifetime: int
+        seconds an entry is kept, at least the longest token lifetime.
+    '''
+
+    def __init__(self, table: Optional[SharedTable] = None, lifetime: int = TOKEN_MAX_LIFETIME):
+        self.table = table
+        self.lifetime = lifetime
+        self._versions: Dict[int, int] = {}
+        self._prune_size = 1024
+
+    def get(self, user_id: int) -> int:
+        '''
+        Current token version of the user
+        '''
+        if self.table is not None:
+            return self.table.get(user_id) or 0
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: int) -> int:
+        '''
+        Invalidate all tokens issued for the user so far
+
+        :raises SharedTableFullError: if the shared table has no free slot,
+            nothing is invalidated then.
+        '''
+        def next_version(version: Optional[int]) -> int:
+            return max(int(time.time()) + self.lifetime, (version or 0) + 1)
+
+        if self.table is not None:
+            return self.table.update(user_id, next_version)
+        if len(self._versions) >= self._prune_size:
+            # Expired entries (users deleted or renamed long ago), amortized over the bumps
+            now = time.time()
+            self._versions = {key: value for key, value in self._versions.items() if value > now}
+            self._prune_size = max(1024, 2 * len(self._versions))
+        version = next_version(self._versions.get(user_id))
+        self._versions[user_id] = version
+        return version
+
+    def is_stale(self, user_id: int, version: int) -> bool:
+        '''
+        Check if a token version is older than the current one
+        '''
+        return version < self.get(user_id)
+
+
+user_versions = UserVersionTable(open_shared_table('user_versions', expiring=True))
+
+
+class TokenCache:
+    '''
+    Bounded LRU cache of verified token payloads
+
+    Maps a token digest to its already verified claims, so repeated requests
+    with the same token skip signature verification and claim parsing.
+    Entries expire at the token's `exp`, revoked tokens must be dropped with
+    `invalidate`. Cached payloads are shared, treat them as read-only.
+
+    With a shared `revocations` table, invalidated tokens are recorded there
+    until their `exp` and every worker's cache drops them on the next hit.
+
+    Attributes
+    ----------
+    max_size : int
+        max number of cached tokens (0 disables the cache)
+    revocations : Optional[SharedTable]
+        invalidated token digests shared by all workers (expiring)
+    hits : int
+        number of cache hits
+    misses : int
+        number of cache misses
+    '''
+
+    def __init__(self, max_size: int, revocations: Optional[SharedTable] = None):
+        self.max_size = max_size
+        self.revocations = revocations
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+    @staticmethod
+    def _shared_key(digest: bytes) -> int:
+        # Non-zero int64 key of a digest in the shared table
+        return int.from_bytes(digest[:8], 'little', signed=True) or 1
+
+    def _is_revoked(self, key: bytes) -> bool:
+        if self.revocations is None:
+            return False
+        expires_at = self.revocations.get(self._shared_key(key))
+        return expires_at is not None and expires_at > time.time()
+
+    def get(self, token: str) -> Optional[dict]:
+        '''
+        Cached payload of a still valid token
+        '''
+        key = self.digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time() or self._is_revoked(key):
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        '''
+        Cache a verified payload until its `exp`
+        '''
+        expires_at = payload.get('exp')
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        key = self.digest(token)
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        '''
+        Drop a (revoked) token from the cache (of every worker with revocations)
+        '''
+        key = self.digest(token)
+        entry = self._entries.pop(key, None)
+        if self.revocations is None:
+            return
+        if entry is not None:
+            expires_at = entry[0]
+        else:
+            # Not cached by this worker, another one may have it
+            try:
+                expires_at = jwt.get_unverified_claims(token).get('exp')
+            except JWTError:
+                return
+        if isinstance(expires_at, (int, float)) and expires_at > time.time():
+            self.revocations.put(self._shared_key(key), int(expires_at) + 1)
+
+    def stats(self) -> dict:
+        '''
+        Snapshot of cache counters
+        '''
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, open_shared_table('revoked_tokens', expiring=True))
@@ -0,0 +1,116 @@
+import time
+import logging
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import bcrypt
+from sqlalchemy import text
+
+from backend.users.config import WARMUP_ENABLED, WARMUP_CONNECTIONS
+from backend.users.model import User, RefreshToken
+from backend.users.service.db_service import async_engine, replica_set, AsyncSessionFactory
+from backend.users.service.hash_service import hash_executor
+from backend.users.service.password_service import password_policy
+from backend.users.service.refresh_token_service import refresh_token_sweeper
+from backend.users.util import key_ring, hash_token
+
+logger = logging.getLogger(__name__)
+# Login lookup placeholder, longer than the username column (64): matches no row
+WARMUP_USERNAME = 'warm-up' * 10
+
+
+class WarmUp:
+    '''
+    Startup warm-up, run by the app lifespan before serving
+
+    Pays the first-request costs up front: opens pool connections,
+    executes the hot `User`/`RefreshToken` statements once (filling
+    SQLAlchemy's compiled statement cache, nothing is matched or changed),
+    builds the JWT keys with a sign/verify round trip and starts the
+    hashing threads with a bcrypt check. Steps are timed, a failing step
+    is logged and reported without blocking startup.
+
+    Attributes
+    ----------
+    enabled : bool
+        run the warm-up at all
+    connections : int
+        pool connections opened concurrently (per engine)
+    ready : bool
+        warm-up finished (or disabled)
+    report : dict
+        step -> {'ms': duration, 'ok': success}
+    '''
+
+    def __init__(self, enabled: bool, connections: int):
+        self.enabled = enabled
+        self.connections = connections
+        self.ready = False
+        self.report: Dict[str, dict] = {}
+        self.steps: List[Tuple[str, Callable[[], Awaitable[None]]]] = [
+            ('db_pool', self.open_connections),
+            ('db_statements', self.compile_statements),
+            ('jwt', self.exercise_jwt),
+            ('password_hash', self.exercise_hashing),
+        ]
+
+    async def open_connections(self) -> None:
+        engines = [async_engine, *replica_set.engines]
+        for engine in engines:
+            # Held at the same time, so the pool really grows to `connections`
+            async with AsyncExitStack() as stack:
+                for _ in range(self.connections):
+                    connection = await stack.enter_async_context(engine.connect())
+                    await connection.execute(text('SELECT 1'))
+
+    async def compile_statements(self) -> None:
+        # Same constructs as the endpoints, so the cache keys match. Filter
+        # values are placeholders that match nothing: an empty value would
+        # mean "order by" (and read the whole table)
+        async with AsyncSessionFactory() as session:
+            async for _ in User.read_all(session, username=WARMUP_USERNAME):
+                pass
+            async for _ in User.read_all(session, limit=1, offset=0):
+                pass
+            await User.read_by_id(session, 0)
+            async for _ in RefreshToken.read_all(session, token=hash_token('')):
+                pass
+            await refresh_token_sweeper.enforce_cap(session, 0)
+
+    async def exercise_jwt(self) -> None:
+        key_ring.decode(key_ring.sign({'sub': 'warm-up', 'exp': int(time.time()) + 60}))
+
+    async def exercise_hashing(self) -> None:
+        # Cheapest cost: starts the executor threads & loads bcrypt, not a real hash
+        hashed_password = bcrypt.hashpw(b'warm-up', bcrypt.gensalt(rounds=4)).decode('utf-8')
+        await hash_executor.run(password_policy.verify, 'warm-up', hashed_password)
+
+    async def run(self) -> Dict[str, dict]:
+        '''
+        Run all steps in order and mark the app ready
+
+        :returns: timing report.
+        :rtype: dict
+        '''
+        if self.enabled:
+            total_start = time.perf_counter()
+            for name, step in self.steps:
+                start_time = time.perf_counter()
+                error: Optional[BaseException] = None
+                try:
+                    await step()
+                except Exception as e:  # pylint: disable=W0718
+                    error = e
+                elapsed = (time.perf_counter() - start_time) * 1000
+                self.report[name] = {'ms': round(elapsed, 2), 'ok': error is None}
+                if error is not None:
+                    logger.error("Warm-up step %s failed after %.1f ms: %r", name, elapsed, error)
+            logger.warning(
+                "Warm-up done in %.1f ms: %s", (time.perf_counter() - total_start) * 1000,
+                ', '.join(f"{name} {step['ms']:.1f} ms" for name, step in self.report.items())
+            )
+        self.ready = True
+        return self.report
+
+
+warm_up = WarmUp(WARMUP_ENABLED, WARMUP_CONNECTIONS)
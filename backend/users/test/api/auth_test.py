@@ -1,6 +1,11 @@
+import importlib
+
 import pytest
 from fastapi import status
 from httpx import AsyncClient
+from jose import jwt
+
+from backend.common.shared import SharedTableFullError
 
 pytestmark = pytest.mark.anyio
 
@@ -79,13 +84,155 @@ async def test_refresh(
     ),
 )
 async def test_logout(
-    client: AsyncClient, admin_token: str,
-    include_headers: bool, status_code: int
+    client: AsyncClient, include_headers: bool, status_code: int
 ):
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    # Own session: logout revokes the access token
+    response = await client.post(
+        "/auth/token", data={"username": "test", "password": "test"},
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    refresh_headers = {"Authorization": f"Bearer {response.json()['refresh_token']}"}
     response = await client.post(
         "/auth/logout", headers=(headers if include_headers else None)
     )
     assert response.status_code == status_code
     if status_code == status.HTTP_204_NO_CONTENT:
         assert "refresh_token" not in response.cookies.__dict__.keys()
+        # Neither token is a working bearer credential after logout
+        for revoked_headers in (headers, refresh_headers):
+            response = await client.get("/user/me", headers=revoked_headers)
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        # Revoked too, for refresh tokens issued without a `typ` claim
+        token_denylist = importlib.import_module(
+            "backend.users.service.denylist_service"
+        ).token_denylist
+        refresh_claims = jwt.get_unverified_claims(refresh_headers["Authorization"][7:])
+        assert token_denylist.is_revoked(refresh_claims["jti"])
+
+
+async def test_logout_with_full_denylist(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    response = await client.post(
+        "/auth/token", data={"username": "test", "password": "test"},
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    token_denylist = importlib.import_module(
+        "backend.users.service.denylist_service"
+    ).token_denylist
+
+    def revoke(jti, expires_at):
+        raise SharedTableFullError("full")
+
+    monkeypatch.setattr(token_denylist, "revoke", revoke)
+    response = await client.post("/auth/logout", headers=headers)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    # Nothing was committed, the session can still be logged out
+    monkeypatch.undo()
+    response = await client.post("/auth/logout", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+async def test_refresh_token_is_not_a_bearer_token(client: AsyncClient):
+    response = await client.post(
+        "/auth/token", data={"username": "test", "password": "test"},
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+    )
+    tokens = response.json()
+    response = await client.get(
+        "/user/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = await client.get(
+        "/user/me", headers={"Authorization": f"Bearer {tokens['access_token']}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+async def test_trusted_claims(
+    client: AsyncClient, admin_token: str, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(
+        importlib.import_module("backend.users.util.auth_util"), "AUTH_TRUST_CLAIMS", True
+    )
+    payload = {"username": "claims", "password": "claims"}
+    user_id = (await client.post("/user/register", json=payload)).json()["id"]
+    response = await client.post(
+        "/auth/token", data=payload,
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await client.get("/user/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["username"] == "claims"
+
+    # Changing claim data invalidates previously issued tokens
+    response = await client.patch(
+        f"/user/{user_id}", json={"is_admin": True},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = await client.get("/user/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_jwks(client: AsyncClient):
+    response = await client.get("http://127.0.0.1:8000/.well-known/jwks.json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"keys": []}
+    assert "max-age" in response.headers["Cache-Control"]
+
+    response = await client.get(
+        "http://127.0.0.1:8000/.well-known/jwks.json",
+        headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+async def test_login_throttling(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    login_throttle = importlib.import_module(
+        "backend.users.service.throttle_service"
+    ).login_throttle
+    monkeypatch.setattr(login_throttle, "user_limit", 2)
+    payload = {"username": "throttled", "password": "wrong"}
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    for _ in range(2):
+        response = await client.post("/auth/token", data=payload, headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await client.post("/auth/token", data=payload, headers=headers)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+async def test_password_rehash_on_login(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    password_policy = importlib.import_module(
+        "backend.users.service.password_service"
+    ).password_policy
+    db_service = importlib.import_module("backend.users.service.db_service")
+    user_model = importlib.import_module("backend.users.model").User
+    payload = {"username": "rehash", "password": "rehash"}
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    monkeypatch.setattr(password_policy, "bcrypt_rounds", 4)
+    user_id = (await client.post("/user/register", json=payload)).json()["id"]
+
+    # Policy upgraded after registration: the hash is replaced on login
+    monkeypatch.setattr(password_policy, "bcrypt_rounds", 5)
+    response = await client.post("/auth/token", data=payload, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    async with db_service.AsyncSessionFactory() as session:
+        user = await user_model.read_by_id(session, user_id)
+        assert user.password.startswith("$2b$05$")
+
+    # A lower policy cost (another worker/host) keeps the stronger hash
+    monkeypatch.setattr(password_policy, "bcrypt_rounds", 4)
+    response = await client.post("/auth/token", data=payload, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    async with db_service.AsyncSessionFactory() as session:
+        user = await user_model.read_by_id(session, user_id)
+        assert user.password.startswith("$2b$05$")
+
+    response = await client.post("/auth/token", data=payload, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
@@ -1,9 +1,13 @@
+import json
+import time
+import importlib
 from typing import Optional
 
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from backend.common.shared import SharedTable
 from backend.users.util.auth_util import verify_password
 
 pytestmark = pytest.mark.anyio
@@ -65,6 +69,77 @@ async def test_get_user(
     assert response.status_code == status_code
 
 
+async def test_get_user_me(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.get("/user/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    # The user loaded by auth is returned as is, no second lookup
+    assert 'desc="1 queries"' in response.headers["Server-Timing"]
+    user = response.json()
+    assert user == (await client.get(f"/user/{user['id']}", headers=headers)).json()
+
+
+async def test_get_users_cursor(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    first_page = await client.get("/user/?limit=1", headers=headers)
+    assert first_page.status_code == status.HTTP_200_OK
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    second_page = await client.get(f"/user/?limit=1&cursor={cursor}", headers=headers)
+    assert second_page.status_code == status.HTTP_200_OK
+    assert second_page.json()[0]["id"] > first_page.json()[0]["id"]
+
+    response = await client.get("/user/?cursor=!", headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Unknown includes are ignored
+    response = await client.get("/user/?limit=1&include_foo=abc", headers=headers)
+    assert response.json() == first_page.json()
+
+
+async def test_get_users_custom_order(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    everyone = (await client.get("/user/?username=", headers=headers)).json()
+    assert [user["username"] for user in everyone] == sorted(user["username"] for user in everyone)
+
+    # Seeking past an id doesn't page other orderings: offsets only, no cursor
+    first_page = await client.get("/user/?limit=1&_id=", headers=headers)
+    assert "X-Next-Cursor" not in first_page.headers
+    second_page = await client.get("/user/?limit=1&offset=1&_id=", headers=headers)
+    assert second_page.json()[0]["id"] < first_page.json()[0]["id"]
+
+    cursor = (await client.get("/user/?limit=1", headers=headers)).headers["X-Next-Cursor"]
+    for query in (f"cursor={cursor}&username=", "after_id=1&_id=", "after_id=1&username="):
+        response = await client.get(f"/user/?limit=1&{query}", headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = await client.get(f"/user/export?{query}", headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_export_users(
+    client: AsyncClient, admin_token: str, monkeypatch: pytest.MonkeyPatch
+):
+    # Tiny batches, so the export spans several cursor fetches
+    monkeypatch.setattr(importlib.import_module(
+        "backend.users.router.user_router"), "EXPORT_BATCH_SIZE", 1
+    )
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    listed = (await client.get("/user/", headers=headers)).json()
+    response = await client.get("/user/export", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == listed
+
+    response = await client.get(
+        f"/user/export?username={listed[0]['username']}", headers=headers
+    )
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [listed[0]["id"]]
+
+    response = await client.get(f"/user/export?after_id={listed[0]['id']}", headers=headers)
+    assert len(response.text.splitlines()) == len(listed) - 1
+
+
 @pytest.mark.parametrize(
     "user_id, payload, status_code",
     (
@@ -96,6 +171,28 @@ async def test_upd_user(
     assert response.status_code == status_code
 
 
+async def test_token_versions_full(
+    client: AsyncClient, admin_token: str, tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    user_versions = importlib.import_module("backend.users.service.token_service").user_versions
+    table = SharedTable(str(tmp_path / "user_versions"), slots=1, expiring=True)
+    table.put(-1, int(time.time()) + 60)
+    monkeypatch.setattr(user_versions, "table", table)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    user_id = (await client.post(
+        "/user/register", json={"username": "versioned", "password": "test"}
+    )).json()["id"]
+
+    # Invalidation can't be recorded: rejected before the change is committed
+    response = await client.patch(f"/user/{user_id}", json={"username": "renamed"}, headers=headers)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    response = await client.delete(f"/user/{user_id}", headers=headers)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    response = await client.get(f"/user/{user_id}", headers=headers)
+    assert response.json()["username"] == "versioned"
+    table.close()
+
+
 @pytest.mark.parametrize(
     "user_id, status_code",
     (
@@ -116,3 +213,44 @@ async def test_delete_user(
     headers = {"Authorization": f"Bearer {admin_token}"}
     response = await client.delete(f"/user/{user_id}", headers=headers)
     assert response.status_code == status_code
+
+
+@pytest.mark.parametrize(
+    "content_type, body, conflict_lines, error_lines",
+    (
+        (
+            "application/x-ndjson",
+            '{"username": "bulk1", "password": "test"}\n'
+            '{"username": "dude", "password": "test"}\n'
+            '{"username": "bulk1", "password": "test"}\n'
+            '{"username": "bulk2"}\n'
+            '\n'
+            '{"username": "bulk3", "password": "test", "is_admin": true}',
+            [2, 3],
+            [4],
+        ),
+        (
+            "text/csv",
+            'username,password,is_admin\n'
+            'bulk4,test,0\n'
+            'dude,test,0\n'
+            'bulk4,test,1\n'
+            'bulk5\n'
+            '\n'
+            'bulk6,test,1\n',
+            [3, 4],
+            [5],
+        ),
+    ),
+)
+async def test_import_users(
+    client: AsyncClient, admin_token: str,
+    content_type: str, body: str, conflict_lines: list, error_lines: list
+):
+    headers = {"Authorization": f"Bearer {admin_token}", "Content-Type": content_type}
+    response = await client.post("/user/import", content=body, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert report["created"] == 2
+    assert sorted(issue["line"] for issue in report["conflicts"]) == conflict_lines
+    assert [issue["line"] for issue in report["errors"]] == error_lines
@@ -0,0 +1,277 @@
+"""
+End-to-end load benchmark for the auth & user endpoints.
+
+Drives a concurrent mixed workload against the real app through
+ASGITransport (no network, same setup as the test suite) and reports
+req/s and p50/p95/p99 latency per route.
+
+Usage (from the directory holding `.env`, e.g. the api container):
+
+    python -m backend.users.test.benchmark.load_bench --duration 10 --output bench.json
+    python -m backend.users.test.benchmark.load_bench --compare bench.json
+
+Runs on the SQLite test database by default, pass `--db-url` to run
+against a dedicated Postgres database instead (tables are created if
+missing and never dropped).
+"""
+# pylint: disable=C0413
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List
+
+WORKLOADS = {
+    'login': 10,
+    'refresh': 10,
+    'me': 50,
+    'admin_list': 20,
+    'register': 10,
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples
+    """
+    if not samples:
+        return 0.0
+    index = max(int(round(q / 100 * len(samples))) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    """
+    Per-route throughput and latency report (ms)
+    """
+    routes = {}
+    for route, samples in sorted(latencies.items()):
+        samples.sort()
+        routes[route] = {
+            'requests': len(samples),
+            'errors': errors.get(route, 0),
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(samples, 50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 95) * 1000, 3),
+            'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'total_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'routes': routes,
+    }
+
+
+class SetupError(RuntimeError):
+    """
+    A worker couldn't register or log in before the measured run
+    """
+
+
+def expect(response, status_code: int, step: str):
+    """
+    Response of a setup request, SetupError if it didn't succeed
+    """
+    if response.status_code != status_code:
+        raise SetupError(f"{step} returned {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from backend.users.service.db_service import async_engine
+    from backend.users.config.admin import create_admin
+    from backend.users.model import Base
+    from backend.users.test.client import create_client
+
+    sqlite = async_engine.url.get_backend_name() == 'sqlite'
+    async with async_engine.begin() as conn:
+        if sqlite:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    run_id = uuid.uuid4().hex[:8]
+    admin_name = f'bench_admin_{run_id}'
+    await create_admin(username=admin_name, password='password')
+    form_headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    routes, weights = zip(*WORKLOADS.items())
+    ready = asyncio.Barrier(args.concurrency + 1)
+    started = asyncio.Event()
+    deadline = 0.0
+
+    async def worker(number: int) -> None:
+        rnd = random.Random(args.seed + number)
+        credentials = {'username': f'bench_{run_id}_{number}', 'password': 'password'}
+        async with create_client() as client:
+            try:
+                admin = expect(await client.post(
+                    '/auth/token', data={'username': admin_name, 'password': 'password'},
+                    headers=form_headers
+                ), 201, 'admin login')
+                admin_headers = {'Authorization': f"Bearer {admin.json()['access_token']}"}
+                # Log in as the worker's own user last, so the refresh cookie is theirs
+                expect(await client.post('/user/register', json=credentials), 201, 'register')
+                response = expect(await client.post(
+                    '/auth/token', data=credentials, headers=form_headers
+                ), 201, 'login')
+                access_token = response.json()['access_token']
+            except Exception:
+                # Release everyone waiting on the barrier instead of blocking forever
+                await ready.abort()
+                raise
+            registered = 0
+            await ready.wait()
+            await started.wait()
+
+            while time.perf_counter() < deadline:
+                route = rnd.choices(routes, weights)[0]
+                start_time = time.perf_counter()
+                if route == 'login':
+                    response = await client.post(
+                        '/auth/token', data=credentials, headers=form_headers
+                    )
+                    if response.status_code == 201:
+                        access_token = response.json()['access_token']
+                elif route == 'refresh':
+                    response = await client.post('/auth/refresh')
+                elif route == 'me':
+                    response = await client.get(
+                        '/user/me', headers={'Authorization': f'Bearer {access_token}'}
+                    )
+                elif route == 'admin_list':
+                    response = await client.get(
+                        f'/user/?limit={args.page_size}', headers=admin_headers
+                    )
+                else:
+                    registered += 1
+                    response = await client.post('/user/register', json={
+                        'username': f'bench_{run_id}_{number}_{registered}',
+                        'password': 'password',
+                    })
+                latencies[route].append(time.perf_counter() - start_time)
+                if response.status_code >= 400:
+                    errors[route] += 1
+
+    workers = [asyncio.create_task(worker(number)) for number in range(args.concurrency)]
+    try:
+        # Setup (registration & logins) isn't measured
+        try:
+            await ready.wait()
+        except asyncio.BrokenBarrierError:
+            for task in workers:
+                task.cancel()
+            results = await asyncio.gather(*workers, return_exceptions=True)
+            raise next(
+                result for result in results
+                if isinstance(result, Exception) and not isinstance(
+                    result, (asyncio.CancelledError, asyncio.BrokenBarrierError)
+                )
+            ) from None
+        start_time = time.perf_counter()
+        deadline = start_time + args.duration
+        started.set()
+        await asyncio.gather(*workers)
+        report = summarize(latencies, errors, time.perf_counter() - start_time)
+    finally:
+        if sqlite:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+        await async_engine.dispose()
+
+    report['meta'] = {
+        'revision': git_revision(),
+        'database': async_engine.url.get_backend_name(),
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'seed': args.seed,
+        'timestamp': int(time.time()),
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print per-route deltas against a baseline, False if p95 regressed past tolerance
+    """
+    ok = True
+    print(f"\nvs baseline {baseline.get('meta', {}).get('revision', '?')}:")
+    for route, stats in report['routes'].items():
+        base = baseline['routes'].get(route)
+        if not base:
+            continue
+        rps_delta = (stats['rps'] / base['rps'] - 1) * 100 if base['rps'] else 0.0
+        p95_delta = (stats['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0.0
+        regressed = p95_delta > tolerance
+        ok = ok and not regressed
+        print(
+            f"  {route:<12} rps {rps_delta:+7.1f}%  p95 {p95_delta:+7.1f}%"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark for the users api')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--page-size', type=int, default=100, help='admin list page size')
+    parser.add_argument('--seed', type=int, default=0, help='workload rng seed')
+    parser.add_argument('--db-url', help='run against this database instead of sqlite')
+    parser.add_argument('--output', help='save the report as a JSON baseline')
+    parser.add_argument('--compare', help='compare against a saved JSON baseline')
+    parser.add_argument(
+        '--tolerance', type=float, default=10.0,
+        help='allowed p95 regression vs baseline (%%)'
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault('TEST', 'True')
+    # Workers log in repeatedly from one address, measure the endpoints rather than the throttle
+    os.environ.setdefault('LOGIN_THROTTLE_USER_LIMIT', '0')
+    os.environ.setdefault('LOGIN_THROTTLE_IP_LIMIT', '0')
+    if args.db_url:
+        os.environ['DATABASE_URL'] = args.db_url
+
+    try:
+        report = asyncio.run(run(args))
+    except SetupError as e:
+        # e.g. registrations & logins over REQUEST_TIMEOUT: lower --concurrency
+        print(f"setup failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{'route':<12} {'req':>7} {'err':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, stats in report['routes'].items():
+        print(
+            f"{route:<12} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>9.1f} "
+            f"{stats['p50_ms']:>8.1f}ms {stats['p95_ms']:>8.1f}ms {stats['p99_ms']:>8.1f}ms"
+        )
+    print(f"total {report['total_rps']:.1f} req/s over {report['elapsed_s']}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
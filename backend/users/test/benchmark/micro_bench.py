@@ -0,0 +1,267 @@
+"""
+Micro-benchmarks for the auth & request hot paths.
+
+Times each function in isolation with fixed inputs and reports ns/op
+(best of several rounds) plus memory per op from tracemalloc: the peak
+allocated while one call runs (transient dicts, copies, encoder buffers)
+and the blocks still held after it (leaks, growing caches). CPython has
+no allocation counter, so these stand in for allocations per op.
+
+Usage (from the directory holding `.env`, e.g. the api container):
+
+    python -m backend.users.test.benchmark.micro_bench
+    python -m backend.users.test.benchmark.micro_bench --check
+    python -m backend.users.test.benchmark.micro_bench --update
+
+`--check` exits with 1 when a benchmark goes over its stored threshold
+(`micro_thresholds.json`), `--update` rewrites the thresholds from the
+current run plus headroom. Time thresholds depend on the machine,
+refresh them with `--update` when the reference hardware changes.
+"""
+# pylint: disable=C0413,C0415
+import os
+import sys
+import json
+import array
+import time
+import asyncio
+import argparse
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'micro_thresholds.json')
+# Stored threshold = measured value * headroom
+TIME_HEADROOM = 2.0
+MEMORY_HEADROOM = 1.25
+# Memory thresholds below this are rounded up (allocator noise)
+MIN_MEMORY_BYTES = 512
+
+Operation = Union[Callable[[], Any], Callable[[], Awaitable[Any]]]
+
+
+def build_benchmarks() -> Dict[str, Operation]:
+    """
+    Benchmarked operations with their fixed inputs
+    """
+    from datetime import datetime, timedelta
+
+    import bcrypt
+    from sqlalchemy import select
+    from starlette.requests import Request
+
+    from backend.common.util import LoadedAttributes, orm_response, process_query_params
+    from backend.users.model import User
+    from backend.users.schema import UserResponse
+    from backend.users.util import create_access_token, get_password_hash, get_token_data, \
+        key_ring, decode_token
+    from backend.users.util.auth_util import verify_password
+
+    token_data = get_token_data(1, 'benchmark', False)
+    expires_delta = timedelta(minutes=15)
+    token = create_access_token(token_data, expires_delta)
+    # Fixed minimal cost: measures the code path, not the configured work factor
+    salt = b'$2b$04$LQSUU5Z7rZu9Cco69ZKnL.'
+    hashed_password = bcrypt.hashpw(b'password', salt).decode('utf-8')
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': '/api/v1/user/', 'headers': [],
+        'query_string': b'limit=50&offset=100&username=benchmark&_id=&include_refresh_tokens=1',
+    }
+    user = User(
+        id=1, username='benchmark', password=hashed_password, is_admin=False,
+        created_at=datetime(2026, 1, 1)
+    )
+
+    def serialize_user():
+        return UserResponse.model_validate(
+            LoadedAttributes(user), from_attributes=True
+        ).model_dump(exclude_unset=True)
+
+    return {
+        'create_access_token': lambda: create_access_token(token_data, expires_delta),
+        # auth_user's decode path, uncached (signature & claims) and cached
+        'jwt_decode': lambda: key_ring.decode(token),
+        'decode_token_cached': lambda: decode_token(token),
+        'verify_password': lambda: verify_password('password', hashed_password),
+        'get_password_hash': lambda: get_password_hash('password'),
+        'process_query_params': lambda: process_query_params(Request(scope)),
+        'apply_includes': lambda: User.apply_includes(
+            select(User), '_id', include_refresh_tokens=1, username='benchmark'
+        ),
+        'build_statement_cached': lambda: User.build_statement(
+            'all', username='benchmark', limit='50', offset=100
+        ),
+        'user_response': serialize_user,
+        'user_response_json': lambda: orm_response(UserResponse, user).body,
+    }
+
+
+def call(operation: Operation, loop: asyncio.AbstractEventLoop) -> Any:
+    result = operation()
+    if asyncio.iscoroutine(result):
+        return loop.run_until_complete(result)
+    return result
+
+
+def time_operation(
+    operation: Operation, loop: asyncio.AbstractEventLoop, min_time: float, rounds: int
+) -> float:
+    """
+    Best ns/op over `rounds`, each running long enough to be measurable
+    """
+    is_async = asyncio.iscoroutine(coroutine := operation())
+    if is_async:
+        loop.run_until_complete(coroutine)
+
+        async def run_many(number: int) -> int:
+            start_time = time.perf_counter_ns()
+            for _ in range(number):
+                await operation()
+            return time.perf_counter_ns() - start_time
+
+        def measure(number: int) -> int:
+            return loop.run_until_complete(run_many(number))
+    else:
+        def measure(number: int) -> int:
+            start_time = time.perf_counter_ns()
+            for _ in range(number):
+                operation()
+            return time.perf_counter_ns() - start_time
+
+    # Calibrate the iteration count like timeit's autorange
+    number = 1
+    while (elapsed := measure(number)) < min_time * 1e9:
+        number *= 2 if elapsed else 10
+    return min(measure(number) for _ in range(rounds)) / number
+
+
+def traced_blocks() -> int:
+    return sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+
+
+def memory_per_operation(
+    operation: Operation, loop: asyncio.AbstractEventLoop, samples: int
+) -> Dict[str, float]:
+    """
+    Peak bytes allocated during one call & blocks retained per call (tracemalloc)
+    """
+    # Warm caches first, they aren't per-operation costs
+    call(operation, loop)
+    # Preallocated C array: recording a sample retains no Python object
+    peaks = array.array('q', bytes(8 * samples))
+    tracemalloc.start()
+    try:
+        start_blocks = traced_blocks()
+        for sample in range(samples):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call(operation, loop)
+            peaks[sample] = tracemalloc.get_traced_memory()[1] - current
+        end_blocks = traced_blocks()
+    finally:
+        tracemalloc.stop()
+    peaks = sorted(peaks)
+    return {
+        'peak_bytes_per_op': float(peaks[len(peaks) // 2]),
+        'retained_blocks_per_op': round(max(end_blocks - start_blocks, 0) / samples, 2),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, dict]:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    try:
+        for name, operation in build_benchmarks().items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = {
+                'ns_per_op': round(time_operation(operation, loop, args.min_time, args.rounds), 1),
+                **memory_per_operation(operation, loop, args.samples),
+            }
+            stats = results[name]
+            print(
+                f"{name:<24} {stats['ns_per_op']:>14,.1f} ns/op "
+                f"{stats['peak_bytes_per_op']:>10,.0f} B/op "
+                f"{stats['retained_blocks_per_op']:>8.2f} blocks/op"
+            )
+    finally:
+        from backend.users.service.hash_service import hash_executor
+        hash_executor.shutdown()
+        loop.close()
+    return results
+
+
+def thresholds_from(results: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    Thresholds for the current results plus headroom
+    """
+    return {
+        name: {
+            'ns_per_op': round(stats['ns_per_op'] * TIME_HEADROOM, 1),
+            'peak_bytes_per_op': max(
+                round(stats['peak_bytes_per_op'] * MEMORY_HEADROOM), MIN_MEMORY_BYTES
+            ),
+            'retained_blocks_per_op': round(stats['retained_blocks_per_op'] + 1, 2),
+        }
+        for name, stats in results.items()
+    }
+
+
+def check(results: Dict[str, dict], thresholds: Dict[str, dict]) -> bool:
+    """
+    Print benchmarks over their thresholds, False if there is any
+    """
+    ok = True
+    for name, stats in results.items():
+        limits: Optional[dict] = thresholds.get(name)
+        if limits is None:
+            print(f"  {name:<24} no threshold, run --update")
+            continue
+        for metric, limit in limits.items():
+            if stats[metric] > limit:
+                ok = False
+                print(f"  {name:<24} {metric} {stats[metric]:,.1f} > {limit:,.1f}  REGRESSION")
+    if ok:
+        print("all benchmarks within thresholds")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the users api hot paths')
+    parser.add_argument('--filter', help='run benchmarks whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing round')
+    parser.add_argument('--rounds', type=int, default=5, help='timing rounds (best is kept)')
+    parser.add_argument('--samples', type=int, default=50, help='calls traced for memory')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='thresholds JSON file')
+    parser.add_argument('--check', action='store_true', help='fail on threshold regressions')
+    parser.add_argument('--update', action='store_true', help='store current results as thresholds')
+    parser.add_argument('--output', help='save the results as JSON')
+    args = parser.parse_args()
+
+    os.environ.setdefault('TEST', 'True')
+    # Fixed work factor, so get_password_hash measures the same input everywhere
+    os.environ['PASSWORD_HASH_ALGORITHM'] = 'bcrypt'
+    os.environ['BCRYPT_ROUNDS'] = '4'
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.update:
+        thresholds = {}
+        if args.filter and os.path.exists(args.thresholds):
+            with open(args.thresholds, encoding='utf-8') as file:
+                thresholds = json.load(file)
+        thresholds.update(thresholds_from(results))
+        with open(args.thresholds, 'w', encoding='utf-8') as file:
+            json.dump(thresholds, file, indent=2, sort_keys=True)
+            file.write('\n')
+    if args.check:
+        with open(args.thresholds, encoding='utf-8') as file:
+            thresholds = json.load(file)
+        if not check(results, thresholds):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+from httpx import AsyncClient, ASGITransport
+
+from backend.users.main import app
+
+
+def create_client(**kwargs) -> AsyncClient:
+    """
+    AsyncClient bound to the app through ASGITransport (no network)
+    """
+    transport = ASGITransport(
+        app=app,
+    )
+    return AsyncClient(
+        base_url="http://127.0.0.1:8000/api/v1",
+        headers={"Content-Type": "application/json"},
+        transport=transport,
+        **kwargs
+    )
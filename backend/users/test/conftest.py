@@ -4,12 +4,12 @@ import os
 os.environ['TEST'] = 'True'
 
 import pytest
-from httpx import AsyncClient, ASGITransport
+from httpx import AsyncClient
 
 from backend.users.service.db_service import async_engine
 from backend.users.config.admin import create_admin
-from backend.users.main import app
 from backend.users.model import Base
+from backend.users.test.client import create_client
 
 
 @pytest.fixture(
@@ -34,14 +34,7 @@ async def start_db():
 
 @pytest.fixture(scope="session", autouse=True)
 async def client(start_db) -> AsyncClient:
-    transport = ASGITransport(
-        app=app,
-    )
-    async with AsyncClient(
-        base_url="http://127.0.0.1:8000/api/v1",
-        headers={"Content-Type": "application/json"},
-        transport=transport,
-    ) as test_client:
+    async with create_client() as test_client:
         yield test_client
 
 
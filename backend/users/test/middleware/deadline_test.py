@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.common.middleware import DeadlineMiddleware, remaining_budget
+
+pytestmark = pytest.mark.anyio
+
+app = FastAPI()
+app.add_middleware(DeadlineMiddleware, timeout=0.2, route_timeouts={"/unbounded": None})
+
+
+@app.get("/budget")
+async def budget():
+    return {"budget": remaining_budget()}
+
+
+@app.get("/slow")
+async def slow():
+    await asyncio.sleep(1)
+
+
+@app.get("/upstream-timeout")
+async def upstream_timeout():
+    raise TimeoutError("upstream")
+
+
+@app.get("/unbounded")
+async def unbounded():
+    await asyncio.sleep(0.3)
+    return {"budget": remaining_budget()}
+
+
+async def test_deadline_middleware():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/budget")
+        assert 0 < response.json()["budget"] <= 0.2
+
+        response = await client.get("/slow")
+        assert response.status_code == 504
+
+        response = await client.get("/unbounded")
+        assert response.status_code == 200
+        assert response.json()["budget"] is None
+
+        # App's own timeouts propagate instead of a deadline 504
+        with pytest.raises(TimeoutError, match="upstream"):
+            await client.get("/upstream-timeout")
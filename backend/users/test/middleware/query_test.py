@@ -0,0 +1,54 @@
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event, text
+
+from backend.common.middleware import QueryStatsMiddleware, QueryBudgetExceeded, query_budget, \
+    UNCOUNTED
+from backend.users.service.db_service import AsyncSessionFactory
+
+pytestmark = pytest.mark.anyio
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware, enforce_budget=True, repeat_threshold=3)
+
+
+@app.get("/queries/{count}", dependencies=[Depends(query_budget(3))])
+async def run_queries(count: int):
+    async with AsyncSessionFactory() as session:
+        for _ in range(count):
+            await session.execute(text("SELECT 1"))
+    return {}
+
+
+@app.get("/session-setup", dependencies=[Depends(query_budget(1))])
+async def run_with_session_setup():
+    async with AsyncSessionFactory() as session:
+        # Like the per-transaction statement_timeout on Postgres
+        @event.listens_for(session.sync_session, 'after_begin')
+        def set_up(session, transaction, connection):
+            connection.exec_driver_sql("SELECT 2", execution_options=UNCOUNTED)
+        await session.execute(text("SELECT 1"))
+    return {}
+
+
+async def test_query_stats(caplog):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/queries/2")
+        assert response.status_code == 200
+        assert 'desc="2 queries"' in response.headers['Server-Timing']
+        assert "N+1" not in caplog.text
+
+        response = await client.get("/queries/3")
+        assert 'desc="3 queries"' in response.headers['Server-Timing']
+        assert "possible N+1, statement executed 3 times: SELECT 1" in caplog.text
+
+        with pytest.raises(QueryBudgetExceeded):
+            await client.get("/queries/4")
+
+
+async def test_query_stats_skip_uncounted():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/session-setup")
+        assert response.status_code == 200
+        assert 'desc="1 queries"' in response.headers['Server-Timing']
@@ -0,0 +1,106 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.common.model import mixin
+from backend.common.model.mixin import CRUDMixin
+from backend.users.model import User, RefreshToken
+from backend.users.service.db_service import AsyncSessionFactory
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_statement_template_is_reused():
+    stmt, params = User.build_statement('all', username='admin', limit='10', offset=0)
+    same_stmt, same_params = User.build_statement('all', username='test', limit='20', offset=0)
+    assert stmt is same_stmt
+    assert params == {'offset': 0, 'f_username': 'admin', 'limit': 10}
+    assert same_params == {'offset': 0, 'f_username': 'test', 'limit': 20}
+
+    # Different filter keys or paging mode get their own template
+    assert User.build_statement('all', id=1, limit='10')[0] is not stmt
+    assert User.build_statement('all', username='admin', after_id=5)[0] is not stmt
+
+
+async def test_statement_cache_is_lru(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(CRUDMixin, "_statement_cache", OrderedDict())
+    monkeypatch.setattr(mixin, "STATEMENT_CACHE_SIZE", 2)
+    login_stmt = User.build_statement('all', username='admin')[0]
+    User.build_statement('all', id=1)
+    # Hit: the login template is the most recently used now
+    User.build_statement('all', username='test')
+    User.build_statement('all', is_admin=True)
+    assert User.build_statement('all', username='admin')[0] is login_stmt
+    assert len(CRUDMixin._statement_cache) == 2
+
+
+async def test_keyset_paging_needs_id_order():
+    assert not User.is_custom_ordered(username='admin', id='', include_refresh_tokens=1)
+    assert User.is_custom_ordered(username='')
+    assert User.is_custom_ordered(_id='')
+    assert User.is_custom_ordered('username')
+    with pytest.raises(ValueError):
+        User.build_statement('all', username='', after_id=5)
+
+
+async def test_statement_ignores_unknown_keys():
+    stmt, params = User.build_statement('id', item_id=1, unknown='value', include_foo='abc')
+    assert params == {'item_id': 1}
+    assert stmt is User.build_statement('id', item_id=2)[0]
+
+
+async def test_single_statement_writes():
+    async with AsyncSessionFactory() as session:
+        first, second = await User.create_many(session, [
+            {'username': 'writes_1', 'password': 'x'},
+            {'username': 'writes_2', 'password': 'x'},
+        ])
+        assert (first.username, second.username) == ('writes_1', 'writes_2')
+        assert first.created_at is not None and second.id > first.id
+        session.add(RefreshToken(
+            user_id=first.id, token='f' * 64, expires_at=datetime.now(timezone.utc)
+        ))
+        await session.commit()
+
+        # Objects already in the session are refreshed from RETURNING
+        updated = await User.update_by_id(session, first.id, is_admin=True, password=None)
+        assert updated is first and first.is_admin and first.password == 'x'
+        assert await User.update_by_id(session, -1, is_admin=True) is None
+
+        assert await User.update_many(session, [
+            {'id': first.id, 'password': 'y'}, {'id': second.id, 'password': 'z'},
+        ]) == 2
+        users = [user async for user in User.read_all(session, username='writes_2')]
+        assert users[0].password == 'z'
+
+        # Refresh tokens are removed by the database (ON DELETE CASCADE)
+        assert await User.delete_by_id(session, first.id) == first.id
+        assert await User.delete_by_id(session, first.id) is None
+        tokens = [token async for token in RefreshToken.read_all(session, token='f' * 64)]
+        assert tokens == []
+
+
+async def test_concurrent_reads_are_coalesced():
+    async with AsyncSessionFactory() as session:
+        user_id = (await User.create(session, username='flight', password='x')).id
+
+    sessions = [AsyncSessionFactory() for _ in range(5)]
+    calls, coalesced = User.read_flights.calls, User.read_flights.coalesced
+    users = await asyncio.gather(*(User.read_by_id(session, user_id) for session in sessions))
+    assert User.read_flights.calls - calls == 1
+    assert User.read_flights.coalesced - coalesced == 4
+    # Every session gets its own persistent copy
+    assert len({id(user) for user in users}) == 5
+    for session, user in zip(sessions, users):
+        assert user in session and not session.dirty
+        assert user.username == 'flight'
+        await session.close()
+
+    # Sessions that wrote read on their own
+    async with AsyncSessionFactory() as session:
+        await User.update_by_id(session, user_id, username='flight2')
+        assert session.sync_session.read_scope() is None
+        assert (await User.read_by_id(session, user_id)).username == 'flight2'
+        await User.delete_by_id(session, user_id)
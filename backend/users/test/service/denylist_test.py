@@ -0,0 +1,68 @@
+import time
+import types
+
+import pytest
+
+from backend.common.shared import SharedTable
+from backend.users.service import denylist_service
+from backend.users.service.denylist_service import TokenDenylist, BloomFilter, jti_key
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_token_denylist(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    path = str(tmp_path / "denylist")
+    denylist = TokenDenylist(path, bloom_bits=1024, bloom_hashes=3)
+    now = time.time()
+    denylist.revoke("a", now + 60)
+    denylist.revoke("b", now + 60)
+    # Already expired tokens need no entry
+    denylist.revoke("c", now - 60)
+    assert denylist.is_revoked("a")
+    assert not denylist.is_revoked("c")
+    assert not denylist.is_revoked("missing")
+    assert not denylist.is_revoked(None)
+    assert len(denylist) == 2
+
+    # Survives a restart
+    restored = TokenDenylist(path, bloom_bits=1024, bloom_hashes=3)
+    assert restored.is_revoked("a") and restored.is_revoked("b")
+
+    # Entries are pruned at their expiry, the file is compacted
+    restored.revoke("long", now + 3600)
+    monkeypatch.setattr(denylist_service, "time", types.SimpleNamespace(time=lambda: now + 120))
+    assert not restored.is_revoked("a")
+    assert restored.is_revoked("long")
+    assert len(restored) == 1
+    assert len(TokenDenylist(path)) == 1
+
+
+async def test_token_denylist_workers_share_file(tmp_path):
+    path = str(tmp_path / "denylist")
+    workers = [TokenDenylist(path), TokenDenylist(path)]
+    now = time.time()
+    workers[0].revoke("a", now + 60)
+    workers[1].revoke("b", now + 60)
+    # Compaction keeps the other worker's revocations
+    workers[1]._compact()
+    assert workers[1].is_revoked("a")
+    restored = TokenDenylist(path)
+    assert restored.is_revoked("a") and restored.is_revoked("b")
+
+
+async def test_bloom_filter():
+    bloom = BloomFilter(bits=4096, hashes=4)
+    keys = [jti_key(str(i)) for i in range(100)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(jti_key(f"other-{i}") in bloom for i in range(1000))
+    assert false_positives < 50
+
+
+async def test_shared_token_denylist(tmp_path):
+    table = SharedTable(str(tmp_path / "revoked_jti"), 16, expiring=True)
+    workers = [TokenDenylist(table=table), TokenDenylist(table=table)]
+    workers[0].revoke("a", time.time() + 60)
+    assert workers[1].is_revoked("a")
+    assert not workers[1].is_revoked("b")
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from backend.common.util import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_single_flight():
+    flight = SingleFlight(timeout=1)
+    release = asyncio.Event()
+    runs = []
+
+    async def load():
+        runs.append(1)
+        await release.wait()
+        return {"id": 1}
+
+    tasks = [asyncio.ensure_future(flight.do("user:1", load, share=dict)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks)
+    assert len(runs) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    # Followers get the shared copy, not the leader's object
+    assert results[1][0] == results[0][0] and results[1][0] is not results[0][0]
+    assert len(flight) == 0
+
+    # Errors reach every waiting caller
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise LookupError("db error")
+
+    results = await asyncio.gather(
+        *(flight.do("user:2", fail) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+async def test_single_flight_timeout_and_cancel():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "leader"
+
+    async def fast():
+        return "own"
+
+    leader = asyncio.ensure_future(flight.do("key", slow))
+    await asyncio.sleep(0.01)
+    # Per-key timeout: a follower stops waiting and runs its own call
+    assert await flight.do("key", fast, timeout=0.01) == ("own", False)
+
+    follower = asyncio.ensure_future(flight.do("key", fast))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    # The leader's cancellation isn't propagated to its followers
+    assert await follower == ("own", False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
@@ -0,0 +1,25 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.users.service.hash_service import HashExecutor, HashQueueFullError
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_executor_rejects_when_full():
+    executor = HashExecutor(workers=1, queue_size=0)
+    release = threading.Event()
+    busy = asyncio.ensure_future(executor.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HashQueueFullError):
+        await executor.run(sum, (1, 2))
+    assert executor.rejected == 1
+
+    release.set()
+    assert await busy is True
+    assert await executor.run(sum, (1, 2)) == 3
+    assert executor.stats()['hashed'] == 2
+    executor.shutdown()
@@ -0,0 +1,36 @@
+import pytest
+
+from backend.users.service.import_service import parse_rows
+
+pytestmark = pytest.mark.anyio
+
+
+async def collect(body: bytes, fmt: str, chunk_size: int = 7) -> list:
+    async def stream():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    return [
+        (line_no, row and row.model_dump(), error)
+        async for line_no, row, error in parse_rows(stream(), fmt)
+    ]
+
+
+async def test_parse_csv_quoted_newlines():
+    body = (
+        b'username,password,is_admin\r\n'
+        b'plain,test,0\r\n'
+        b'"multi\r\n'
+        b'\r\n'
+        b'line","pass ""quoted""\nword",1\r\n'
+        b'\n'
+        b'after,test,0\n'
+        b'"open,test,0\n'
+    )
+    rows = await collect(body, 'csv')
+    assert [(line_no, row and row['username']) for line_no, row, _ in rows] == [
+        (2, 'plain'), (3, 'multi\n\nline'), (8, 'after'), (9, None),
+    ]
+    assert rows[1][1]['password'] == 'pass "quoted"\nword'
+    assert rows[1][1]['is_admin']
+    assert rows[3][2] == "Unterminated quoted field"
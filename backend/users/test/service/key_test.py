@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from jose import JWTError, jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from backend.users.service.key_service import KeyRing
+
+pytestmark = pytest.mark.anyio
+
+
+def write_key(path, kid: str, public: bool = False) -> None:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if public:
+        pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    else:
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+    (path / f"{kid}.pem").write_bytes(pem)
+
+
+async def test_key_ring_rotation(tmp_path):
+    write_key(tmp_path, "2026-01")
+    old_ring = KeyRing("RS256", keys_dir=str(tmp_path))
+    old_token = old_ring.sign({"user_id": 1})
+
+    # New key becomes active, the old one still verifies its tokens
+    write_key(tmp_path, "2026-02")
+    key_ring = KeyRing("RS256", keys_dir=str(tmp_path))
+    assert key_ring.active_kid == "2026-02"
+    assert key_ring.decode(old_token) == {"user_id": 1}
+    assert key_ring.decode(key_ring.sign({"user_id": 2})) == {"user_id": 2}
+
+    jwks = json.loads(key_ring.jwks())
+    assert sorted(key["kid"] for key in jwks["keys"]) == ["2026-01", "2026-02"]
+    assert all("d" not in key for key in jwks["keys"])
+
+    # Tokens signed with a key outside of the ring are rejected
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    write_key(other_dir, "other")
+    with pytest.raises(JWTError):
+        key_ring.decode(KeyRing("RS256", keys_dir=str(other_dir)).sign({"user_id": 1}))
+
+
+async def test_key_ring_verify_only_keys(tmp_path):
+    write_key(tmp_path, "2026-01", public=True)
+    with pytest.raises(RuntimeError):
+        KeyRing("RS256", keys_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize("algorithm", ("HS256", "HS512"))
+async def test_key_ring_sign_matches_jose(algorithm: str):
+    key_ring = KeyRing(algorithm, secret="secret")
+    claims = {"user_id": 1, "username": "jürgen", "is_admin": False, "jti": "a", "exp": 2000000000}
+    token = key_ring.sign(claims)
+    assert token == jwt.encode(dict(claims), "secret", algorithm=algorithm)
+    assert key_ring.decode(token) == claims
+
+    # Datetimes are encoded like python-jose does, the claims aren't modified
+    expires_at = datetime(2033, 5, 18, 3, 33, 20, tzinfo=timezone.utc)
+    dated_claims = {**claims, "exp": expires_at}
+    assert key_ring.sign(dated_claims) == token
+    assert dated_claims["exp"] is expires_at
+
+
+async def test_key_ring_rs256_sign_matches_jose(tmp_path):
+    write_key(tmp_path, "2026-01")
+    key_ring = KeyRing("RS256", keys_dir=str(tmp_path))
+    claims = {"user_id": 1, "exp": 2000000000}
+    assert key_ring.sign(claims) == jwt.encode(
+        claims, (tmp_path / "2026-01.pem").read_text(), algorithm="RS256",
+        headers={"kid": "2026-01"}
+    )
+
+
+async def test_key_ring_reload_if_changed(tmp_path):
+    write_key(tmp_path, "2026-01")
+    key_ring = KeyRing("RS256", keys_dir=str(tmp_path))
+    old_token = key_ring.sign({"user_id": 1})
+    assert not key_ring.reload_if_changed()
+
+    # Published as verify-only first, signing switches once the private key lands
+    write_key(tmp_path, "2026-02", public=True)
+    assert key_ring.reload_if_changed()
+    assert key_ring.active_kid == "2026-01"
+    write_key(tmp_path, "2026-02")
+    assert key_ring.reload_if_changed()
+    assert key_ring.active_kid == "2026-02"
+    assert key_ring.decode(old_token) == {"user_id": 1}
+
+    (tmp_path / "2026-01.pem").unlink()
+    assert key_ring.reload_if_changed()
+    with pytest.raises(JWTError):
+        key_ring.decode(old_token)
+
+
+async def test_key_ring_requires_secret():
+    with pytest.raises(RuntimeError):
+        KeyRing("HS256")
+    with pytest.raises(RuntimeError):
+        KeyRing("HS256", secret="")
@@ -0,0 +1,53 @@
+import pytest
+
+from httpx import AsyncClient, ASGITransport
+
+from backend.common.metrics import Registry
+from backend.users.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_registry_render():
+    registry = Registry()
+    latency = registry.histogram(
+        'latency_seconds', 'Latency', labelnames=('route',), buckets=(0.1, 1.0)
+    )
+    requests = registry.counter('requests', 'Requests')
+    registry.callback('cache', 'Cache', lambda: {'hit': 3}, type='counter', label='result')
+    registry.callback('skipped', 'Skipped', lambda: None)
+
+    latency.labels('/a').observe(0.05)
+    latency.labels('/a').observe(0.5)
+    latency.labels('/a').observe(5)
+    requests.inc()
+    lines = registry.render().decode().splitlines()
+
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'requests_total 1' in lines
+    assert 'cache_total{result="hit"} 3' in lines
+    assert not [line for line in lines if line.startswith('skipped')]
+
+    with pytest.raises(ValueError):
+        registry.counter('requests', 'Requests')
+
+
+async def test_metrics_endpoint():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://127.0.0.1:8000") as client:
+        await client.get("/.well-known/jwks.json")
+        await client.get("/missing")
+        response = await client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_request_duration_seconds_count{route="/.well-known/jwks.json",method="GET",status="200"}' \
+        in body
+    assert 'route="<unmatched>",method="GET",status="404"' in body
+    assert 'http_requests_in_flight 1' in body
+    assert 'jwt_operations_total{operation="encode"}' in body
+    assert 'refresh_token_sweep_duration_seconds_total ' in body
+    assert 'refresh_token_sweep_last_duration_seconds ' in body
@@ -0,0 +1,69 @@
+import pytest
+
+from backend.common.shared import SharedTable
+from backend.users.service.password_service import PasswordPolicy, bcrypt_rounds
+
+pytestmark = pytest.mark.anyio
+
+
+def create_policy(**kwargs) -> PasswordPolicy:
+    params = {
+        "algorithm": "bcrypt", "bcrypt_rounds": 4, "argon2_time_cost": 1,
+        "argon2_memory_cost": 8, "argon2_parallelism": 1,
+    }
+    return PasswordPolicy(**{**params, **kwargs})
+
+
+async def test_password_policy_rehash():
+    policy = create_policy()
+    hashed_password = policy.hash("secret")
+    assert bcrypt_rounds(hashed_password) == 4
+    assert policy.verify("secret", hashed_password)
+    assert not policy.verify("wrong", hashed_password)
+    assert not policy.needs_rehash(hashed_password)
+
+    # Stronger policy: older hashes still verify but are flagged for upgrade
+    stronger = create_policy(bcrypt_rounds=5)
+    assert stronger.verify("secret", hashed_password)
+    assert stronger.needs_rehash(hashed_password)
+    assert stronger.needs_rehash("$unknown$scheme")
+    # Hashes above the policy cost are kept (no bouncing between costs)
+    assert not create_policy(bcrypt_rounds=4).needs_rehash(stronger.hash("secret"))
+
+    with pytest.raises(RuntimeError):
+        create_policy(algorithm="md5")
+
+
+async def test_password_policy_calibrate(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    policy = create_policy()
+    # Nothing fits into the target: the floor cost is kept
+    assert policy.calibrate(0.0001) == 10
+    assert policy.bcrypt_rounds == 10
+
+    policy.calibrate(3600)
+    assert policy.bcrypt_rounds == 16
+
+    # Never below the configured cost unless allowed
+    assert create_policy(bcrypt_rounds=12).calibrate(0.0001) == 12
+    assert create_policy(bcrypt_rounds=12).calibrate(0.0001, allow_lower=True) == 10
+
+    # The first calibration is shared, the other workers reuse its cost
+    shared = SharedTable(str(tmp_path / "password_cost"), 64)
+    monkeypatch.setattr(PasswordPolicy, "_measure_bcrypt_cost", staticmethod(lambda *_: 11))
+    assert create_policy().calibrate(0.0001, shared=shared) == 11
+    monkeypatch.setattr(PasswordPolicy, "_measure_bcrypt_cost", staticmethod(pytest.fail))
+    assert create_policy().calibrate(0.0001, shared=shared) == 11
+    shared.close()
+
+
+async def test_argon2id_policy():
+    pytest.importorskip("argon2")
+    policy = create_policy(algorithm="argon2id")
+    hashed_password = policy.hash("secret")
+    assert hashed_password.startswith("$argon2id$")
+    assert policy.verify("secret", hashed_password)
+    assert not policy.verify("wrong", hashed_password)
+    assert not policy.needs_rehash(hashed_password)
+    assert create_policy(argon2_time_cost=2, algorithm="argon2id").needs_rehash(hashed_password)
+    # Migrating from bcrypt
+    assert policy.needs_rehash(create_policy().hash("secret"))
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.users.model import RefreshToken, User
+from backend.users.service.db_service import AsyncSessionFactory
+from backend.users.service.refresh_token_service import RefreshTokenSweeper
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sweeper_removes_expired_and_caps_sessions():
+    sweeper = RefreshTokenSweeper(AsyncSessionFactory, interval=0, batch_size=2, max_per_user=2)
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionFactory() as session:
+        expired_user, user = await User.create_many(session, [
+            {'username': 'sweep_expired', 'password': 'x'},
+            {'username': 'sweep_capped', 'password': 'x'},
+        ])
+        session.add_all([
+            RefreshToken(
+                user_id=expired_user.id, token=f'{index:064x}', expires_at=now - timedelta(days=1)
+            )
+            for index in range(5)
+        ] + [
+            RefreshToken(user_id=user.id, token=f'{index:064x}', expires_at=now + timedelta(days=1))
+            for index in range(5, 8)
+        ])
+        await session.commit()
+
+        assert await sweeper.sweep() == 5
+        assert sweeper.stats()['removed'] == 5
+
+        assert await sweeper.enforce_cap(session, user.id) == 1
+        tokens = [token async for token in RefreshToken.read_all(session, user_id=user.id)]
+        assert [token.token for token in tokens] == [f'{6:064x}', f'{7:064x}']
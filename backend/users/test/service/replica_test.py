@@ -0,0 +1,80 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, delete
+
+from backend.users.model import Base, User
+from backend.users.service.db_service import DATABASE_URL, AsyncSessionFactory, \
+    RoutingSession, ReplicaSet, create_engine, current_user_id, use_primary
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_replica_routing(monkeypatch: pytest.MonkeyPatch):
+    replicas = [create_engine(DATABASE_URL), create_engine(DATABASE_URL)]
+    replica_set = ReplicaSet(replicas, read_after_write=60, retry_interval=60)
+    monkeypatch.setattr(RoutingSession, "replicas", replica_set)
+
+    def bind(session, clause):
+        return session.sync_session.get_bind(clause=clause)
+
+    async with AsyncSessionFactory() as session:
+        # Round-robin over the replicas, locking reads stay on the primary
+        assert bind(session, select(User)) is replicas[0].sync_engine
+        assert bind(session, select(User)) is replicas[1].sync_engine
+        assert bind(session, select(User).with_for_update()) is session.bind.sync_engine
+        await session.execute(select(User).limit(1))
+
+        # Failed replicas are skipped, primary when none is left
+        replica_set.mark_down(replicas[0])
+        assert bind(session, select(User)) is replicas[1].sync_engine
+        assert bind(session, select(User)) is replicas[1].sync_engine
+        replica_set.mark_down(replicas[1])
+        assert bind(session, select(User)) is session.bind.sync_engine
+
+    replica_set = ReplicaSet(replicas, read_after_write=60, retry_interval=60)
+    monkeypatch.setattr(RoutingSession, "replicas", replica_set)
+    token = current_user_id.set(42)
+    try:
+        async with AsyncSessionFactory() as session:
+            assert bind(session, select(User)) is replicas[0].sync_engine
+            # A write keeps the session and the user on the primary
+            await session.execute(delete(User).where(User.id == -1))
+            assert bind(session, select(User)) is session.bind.sync_engine
+        async with AsyncSessionFactory() as session:
+            assert bind(session, select(User)) is session.bind.sync_engine
+    finally:
+        current_user_id.reset(token)
+
+    async with AsyncSessionFactory() as session:
+        assert bind(session, select(User)) is replicas[1].sync_engine
+        assert bind(use_primary(session), select(User)) is session.bind.sync_engine
+
+    for engine in replicas:
+        await engine.dispose()
+
+
+async def test_login_after_register_with_lagging_replica(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch, tmp_path
+):
+    # Replica with the schema but none of the primary's rows
+    replica = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    async with replica.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(
+        RoutingSession, "replicas", ReplicaSet([replica], read_after_write=60, retry_interval=60)
+    )
+
+    # Register & login are anonymous, drop the user id earlier in-process requests left
+    token = current_user_id.set(None)
+    try:
+        payload = {"username": "replica-lag", "password": "replica-lag"}
+        response = await client.post("/user/register", json=payload)
+        assert response.status_code == 201
+        response = await client.post(
+            "/auth/token", data=payload,
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        )
+        assert response.status_code == 201
+    finally:
+        current_user_id.reset(token)
+    await replica.dispose()
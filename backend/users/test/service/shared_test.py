@@ -0,0 +1,99 @@
+import time
+import multiprocessing
+
+import pytest
+
+from backend.common.shared import SharedTable, SharedTableFullError
+from backend.users.service.token_service import UserVersionTable, TokenCache
+
+pytestmark = pytest.mark.anyio
+
+
+def bump_versions(path: str, slots: int, times: int):
+    versions = UserVersionTable(SharedTable(path, slots, expiring=True))
+    for _ in range(times):
+        versions.bump(1)
+
+
+async def test_shared_table(tmp_path):
+    path = str(tmp_path / "table")
+    table = SharedTable(path, slots=4)
+    assert table.get(1) is None
+    assert table.update(1, lambda value: (value or 0) + 1) == 1
+    table.put(5, 50)
+    # Same file, same entries
+    assert SharedTable(path, slots=4).get(5) == 50
+
+    for key in (2, 3):
+        table.put(key, key)
+    assert len(table) == 4
+    with pytest.raises(SharedTableFullError):
+        table.put(9, 9)
+
+    # Another layout resets the table
+    assert SharedTable(path, slots=8).get(5) is None
+
+
+async def test_shared_table_expiring(tmp_path):
+    table = SharedTable(str(tmp_path / "table"), slots=2, expiring=True)
+    now = int(time.time())
+    table.put(1, now - 1)
+    table.put(2, now + 60)
+    # Expired slots are reused
+    table.put(3, now + 60)
+    assert table.get(3) == now + 60
+    assert table.get(1) is None
+    with pytest.raises(SharedTableFullError):
+        table.put(4, now + 60)
+
+
+async def test_user_versions_expire(tmp_path):
+    table = SharedTable(str(tmp_path / "user_versions"), slots=2, expiring=True)
+    versions = UserVersionTable(table, lifetime=60)
+    version = versions.bump(1)
+    assert version > time.time()
+    assert versions.is_stale(1, 0) and not versions.is_stale(1, version)
+    assert versions.bump(1) > version
+    versions.bump(2)
+    with pytest.raises(SharedTableFullError):
+        versions.bump(3)
+
+    # Past its lifetime, every token of the old versions has expired: the slot is reused
+    table.put(1, int(time.time()) - 1)
+    versions.bump(3)
+    assert versions.get(1) == 0 and versions.get(3) > 0
+
+    # In process: expired entries are pruned
+    local = UserVersionTable(lifetime=60)
+    local._versions[2] = int(time.time()) - 1
+    local._prune_size = 0
+    version = local.bump(1)
+    assert local.get(2) == 0 and local.is_stale(1, version - 1)
+
+
+async def test_shared_state_across_processes(tmp_path):
+    path = str(tmp_path / "user_versions")
+    versions = UserVersionTable(SharedTable(path, slots=16, expiring=True))
+    first = versions.bump(1)
+    workers = [
+        multiprocessing.get_context("fork").Process(target=bump_versions, args=(path, 16, 50))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # Every bump moved the version forward
+    assert versions.get(1) >= first + 200
+    assert versions.is_stale(1, first + 199)
+    assert versions.get(2) == 0
+
+    # A token invalidated by one worker is dropped from the other's cache
+    revocations = str(tmp_path / "revoked_tokens")
+    caches = [TokenCache(8, SharedTable(revocations, 16, expiring=True)) for _ in range(2)]
+    payload = {"user_id": 1, "exp": int(time.time()) + 60}
+    for cache in caches:
+        cache.put("token", payload)
+    caches[0].invalidate("token")
+    assert caches[1].get("token") is None
+    assert caches[1].get("other") is None
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from backend.users.service.throttle_service import MemoryThrottleBackend, \
+    SharedThrottleBackend, LoginThrottle
+
+pytestmark = pytest.mark.anyio
+
+
+class LocalStore:
+    """
+    Stand-in for a shared key-value store (Redis subset)
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    async def get(self, key):
+        value = self.values.get(key)
+        # Reply round trip, lets concurrent hits interleave
+        await asyncio.sleep(0)
+        return value
+
+    async def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def decr(self, key):
+        self.values[key] -= 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+
+@pytest.mark.parametrize("backend_class", ("memory", "shared"))
+async def test_login_throttle(backend_class):
+    store = LocalStore()
+    backend = MemoryThrottleBackend() if backend_class == "memory" \
+        else SharedThrottleBackend(store)
+    throttle = LoginThrottle(backend, window=3600, user_limit=3, ip_limit=5)
+
+    for _ in range(3):
+        assert await throttle.check("alice", "10.0.0.1") is None
+    retry_after = await throttle.check("Alice", "10.0.0.1")
+    assert 1 <= retry_after <= 3600
+
+    # Other usernames from the same address hit the IP limit
+    assert await throttle.check("bob", "10.0.0.1") is None
+    assert await throttle.check("carol", "10.0.0.1") is not None
+    assert await throttle.check("carol", "10.0.0.2") is None
+    assert throttle.throttled == 2
+    if backend_class == "shared":
+        assert set(store.ttls.values()) == {7200}
+
+
+async def test_shared_throttle_concurrent_hits():
+    store = LocalStore()
+    backend = SharedThrottleBackend(store)
+    results = await asyncio.gather(*(backend.hit("user:alice", 3, 3600) for _ in range(10)))
+    assert sum(result is None for result in results) == 3
+    # Rejected attempts aren't counted
+    assert list(store.values.values()) == [3]
+
+
+async def test_memory_throttle_evicts_least_recent():
+    backend = MemoryThrottleBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        await backend.hit(key, 1, 3600)
+    assert list(backend._counters) == ["b", "c"]
+
+    # Throttled attempts count as use as well
+    assert await backend.hit("b", 1, 3600) is not None
+    await backend.hit("d", 1, 3600)
+    assert list(backend._counters) == ["b", "d"]
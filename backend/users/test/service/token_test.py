@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+from backend.users.service.token_service import TokenCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_token_cache():
+    cache = TokenCache(max_size=2)
+    exp = int(time.time()) + 60
+    cache.put("a", {"user_id": 1, "exp": exp})
+    cache.put("expired", {"user_id": 2, "exp": int(time.time()) - 1})
+    assert cache.get("a") == {"user_id": 1, "exp": exp}
+    assert cache.get("expired") is None
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    # Least recently used token is evicted first
+    for token in ("a", "b", "c"):
+        cache.put(token, {"exp": exp})
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from backend.common.model.mixin import CRUDMixin
+from backend.users.model import User
+from backend.users.service.warmup_service import WarmUp, warm_up
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_warm_up(client: AsyncClient):
+    response = await client.get("http://127.0.0.1:8000/health")
+    assert response.status_code == status.HTTP_200_OK
+    # No lifespan in tests: not warmed up yet
+    response = await client.get("http://127.0.0.1:8000/health/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    report = await warm_up.run()
+    assert set(report) == {"db_pool", "db_statements", "jwt", "password_hash"}
+    assert all(step["ok"] for step in report.values())
+    response = await client.get("http://127.0.0.1:8000/health/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["warmup"] == report
+
+
+async def test_warm_up_statements(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(CRUDMixin, "_statement_cache", OrderedDict())
+    await warm_up.compile_statements()
+    cached = list(CRUDMixin._statement_cache.values())
+    # The login lookup's filter template (WHERE username = ...), not an ORDER BY username
+    login_stmt = User.build_statement("all", username="admin")[0]
+    assert any(stmt is login_stmt for stmt in cached)
+    assert "WHERE" in str(login_stmt)
+    order_stmt = User.build_statement("all", username="")[0]
+    assert not any(stmt is order_stmt for stmt in cached)
+
+
+async def test_warm_up_failing_step():
+    async def fail():
+        raise ConnectionError("db is down")
+
+    warm_up_failing = WarmUp(enabled=True, connections=1)
+    warm_up_failing.steps = [("db_pool", fail), *warm_up_failing.steps[2:]]
+    report = await warm_up_failing.run()
+    # Reported, but doesn't block startup
+    assert warm_up_failing.ready
+    assert not report["db_pool"]["ok"]
+    assert report["jwt"]["ok"]
+
+    disabled = WarmUp(enabled=False, connections=1)
+    assert await disabled.run() == {}
+    assert disabled.ready
@@ -1,3 +1,4 @@
 from .auth_util import get_password_hash, authenticate_user, create_access_token, \
     REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES, oauth2_scheme, \
-    auth_user, auth_admin
+    auth_user, authenticate_token, auth_admin, check_password, get_token_data, \
+    get_refresh_token_data, hash_token, key_ring, decode_token, throttle_login
@@ -1,24 +1,54 @@
 import os
+import time
+import uuid
+import hashlib
 from typing import Annotated
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
-import bcrypt
-from jose import jwt, JWTError
-from fastapi import Depends, status, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from fastapi import Depends, Request, status, HTTPException
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.users.config import AUTH_TRUST_CLAIMS, JWT_ALGORITHM, JWT_KEYS_DIR, \
+    JWT_ACTIVE_KID, JWT_KEYS_RELOAD_INTERVAL
 from backend.users.model import User
-from backend.users.service.db_service import get_session
+from backend.users.service.db_service import get_session, current_user_id, use_primary
+from backend.users.service.denylist_service import token_denylist
+from backend.users.service.hash_service import hash_executor, HashQueueFullError
+from backend.users.service.password_service import password_policy
+from backend.users.service.key_service import KeyRing
+from backend.users.service.throttle_service import login_throttle
+from backend.users.service.token_service import user_versions, token_cache
 from backend.users.schema import UserResponse
 
 SECRET_KEY = os.getenv('SECRET_KEY')
-ALGORITHM = "HS256"
+ALGORITHM = JWT_ALGORITHM
 # 7 days refresh / 15 minutes access
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
+key_ring = KeyRing(
+    ALGORITHM, SECRET_KEY, JWT_KEYS_DIR, JWT_ACTIVE_KID, JWT_KEYS_RELOAD_INTERVAL
+)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify and decode JWT token, verified payloads are cached until `exp`.
+
+    :param token: encoded JWT token.
+    :type token: str
+    :raises JWTError: if the token is invalid or expired.
+    :returns: token claims (read-only).
+    :rtype: dict
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = key_ring.decode(token)
+        token_cache.put(token, payload)
+    return payload
 
 
 async def auth_user(
@@ -26,14 +56,32 @@ async def auth_user(
     db_session: AsyncSession = Depends(get_session)
 ):
     """
-    OAUTH Depency to check if user is authenticated
+    OAUTH Depency to check if user is authenticated (access tokens only)
 
     :param token : user's JWT token saved in Headers
     :type token : str
     :param db_session : database async session instance
     :type db_session : AsyncSession
-    :returns : user instance
-    :rtype : html.HtmlElement | None
+    :returns : principal (id, username, is_admin) and the loaded `user` row
+        (None if AUTH_TRUST_CLAIMS is set, only token claims are checked)
+    :rtype : dict
+    """
+    return await authenticate_token(token, db_session)
+
+
+async def authenticate_token(token: str, db_session: AsyncSession, allow_refresh: bool = False):
+    """
+    Check a JWT token and load its user
+
+    :param token: encoded JWT token.
+    :type token: str
+    :param db_session: database async session instance.
+    :type db_session: AsyncSession
+    :param allow_refresh: accept refresh tokens (`typ` claim), only /auth/refresh does.
+    :type allow_refresh: bool
+    :raises HTTPException: 401 if the token is invalid, revoked or stale.
+    :returns: principal (id, username, is_admin) and the loaded `user` row.
+    :rtype: dict
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,16 +89,35 @@ async def auth_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: int = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
     except JWTError as e:
         raise credentials_exception from e
-    user = [user async for user in User.read_all(db_session, id=user_id)]
-    if user is None or len(user) == 0:
+    if payload.get("typ") == "refresh" and not allow_refresh:
+        raise credentials_exception
+    # Revoked on logout, in-memory lookup
+    if token_denylist.is_revoked(payload.get("jti")):
+        token_denylist.rejected += 1
         raise credentials_exception
-    return UserResponse(**user[0].__dict__).model_dump(exclude_unset=True)
+    # Reads of a user who just wrote are served by the primary
+    current_user_id.set(user_id)
+    if AUTH_TRUST_CLAIMS:
+        if user_versions.is_stale(user_id, payload.get("ver", 0)):
+            raise credentials_exception
+        return {
+            "id": user_id,
+            "username": payload.get("username"),
+            "is_admin": payload.get("is_admin", False),
+            "user": None,
+        }
+    # Concurrent requests of the same user share one lookup (single-flight)
+    user = await User.read_by_id(db_session, user_id)
+    if user is None:
+        raise credentials_exception
+    # The row is serialized once by the endpoint that returns it (/user/me)
+    return {"id": user.id, "username": user.username, "is_admin": user.is_admin, "user": user}
 
 
 async def auth_admin(
@@ -74,9 +141,33 @@ async def auth_admin(
     return current_user
 
 
+async def throttle_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+):
+    """
+    Dependency to reject login attempts over the per username/IP limits
+    before any credential check.
+
+    :param request: login request.
+    :type request: Request
+    :param form_data: login form (shared with the endpoint).
+    :type form_data: OAuth2PasswordRequestForm
+    :raises HTTPException: 429 with Retry-After if the attempt is throttled.
+    """
+    client_ip = request.client.host if request.client else None
+    retry_after = await login_throttle.check(form_data.username, client_ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 def verify_password(plain_password, hashed_password):
     """
-    Verify plain text password against hashed one.
+    Verify plain text password against hashed one (any supported scheme, blocking).
 
     :param plain_password: plain text password.
     :type plain_password: str
@@ -85,24 +176,93 @@ def verify_password(plain_password, hashed_password):
     :returns: True if the password matches, False otherwise.
     :rtype: bool
     """
-    password_byte_enc = plain_password.encode('utf-8')
-    hashed_password_byte_enc = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password=password_byte_enc, hashed_password=hashed_password_byte_enc)
+    return password_policy.verify(plain_password, hashed_password)
+
+
+def hash_password(password):
+    """
+    Hash plain text password with the current password policy (blocking).
+
+    :param password: plain text password.
+    :type password: str
+    :returns: hashed password.
+    :rtype: str
+    """
+    return password_policy.hash(password)
 
 
 async def get_password_hash(password):
     """
-    Hash plain text password using bcrypt.
+    Hash plain text password in the hashing executor.
 
     :param password: plain text password.
     :type password: str
+    :raises HashQueueFullError: if the hashing queue is full.
     :returns: hashed password.
     :rtype: str
     """
-    pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
-    return hashed_password.decode('utf-8')
+    return await hash_executor.run(hash_password, password)
+
+
+async def check_password(plain_password, hashed_password):
+    """
+    Verify plain text password in the hashing executor.
+
+    :param plain_password: plain text password.
+    :type plain_password: str
+    :param hashed_password: hashed password.
+    :type hashed_password: str
+    :raises HashQueueFullError: if the hashing queue is full.
+    :returns: True if the password matches, False otherwise.
+    :rtype: bool
+    """
+    return await hash_executor.run(verify_password, plain_password, hashed_password)
+
+
+def get_token_data(user_id: int, username: str, is_admin: bool) -> dict:
+    """
+    Build JWT claims for the user.
+
+    :param user_id: user's id.
+    :type user_id: int
+    :param username: user's username.
+    :type username: str
+    :param is_admin: does user have admin rights.
+    :type is_admin: bool
+    :returns: token claims.
+    :rtype: dict
+    """
+    return {
+        "user_id": user_id,
+        "username": username,
+        "is_admin": is_admin,
+        "ver": user_versions.get(user_id),
+    }
+
+
+def get_refresh_token_data(token_data: dict) -> dict:
+    """
+    Build refresh token claims, every refresh token gets a unique `jti`
+    and `typ` (not accepted as a bearer token by `auth_user`).
+
+    :param token_data: token claims.
+    :type token_data: dict
+    :returns: refresh token claims.
+    :rtype: dict
+    """
+    return {**token_data, "jti": uuid.uuid4().hex, "typ": "refresh"}
+
+
+def hash_token(token: str) -> str:
+    """
+    Digest of a token as stored in the database.
+
+    :param token: encoded JWT token.
+    :type token: str
+    :returns: SHA-256 hex digest.
+    :rtype: str
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -117,12 +277,11 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     :rtype: str
     """
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # Unique id, so the token can be revoked (refresh token data already has one)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    # Integer NumericDate, as python-jose encodes an `exp` datetime
+    to_encode["exp"] = int(time.time() + (expires_delta or timedelta(minutes=15)).total_seconds())
+    encoded_jwt = key_ring.sign(to_encode)
     return encoded_jwt
 
 
@@ -130,6 +289,12 @@ async def authenticate_user(db_session: AsyncSession, username: str, password: s
     """
     Authenticate user by username and password.
 
+    A hash out of the current password policy (older cost or algorithm)
+    is replaced while the plain password is at hand, so policy upgrades
+    roll out as users log in. The lookup reads from the primary: the user
+    isn't known (and pinned) before authentication, and a lagging replica
+    would reject a just registered user or accept a replaced password.
+
     :param db_session: database session.
     :type db_session: AsyncSession
     :param username: user's username.
@@ -139,9 +304,19 @@ async def authenticate_user(db_session: AsyncSession, username: str, password: s
     :returns: authenticated user or False if authentication fails.
     :rtype: User | bool
     """
-    user_instance = [user async for user in User.read_all(db_session, username=username)]
+    user_instance = [
+        user async for user in User.read_all(use_primary(db_session), username=username)
+    ]
     if not user_instance:
         return False
-    if not verify_password(password, user_instance[0].password):
+    user = user_instance[0]
+    if not await check_password(password, user.password):
         return False
-    return user_instance[0]
+    if password_policy.needs_rehash(user.password):
+        try:
+            hashed_password = await get_password_hash(password)
+        except HashQueueFullError:
+            # Under load: keep the old hash, it is upgraded on a later login
+            return user
+        await User.update_by_id(db_session, user.id, password=hashed_password)
+    return user